@@ -0,0 +1,107 @@
+"""
+Per-call Python overhead of the hot lookups (get_user_auth, get_chat_object, get_task, get_executor):
+statements built inline on every call versus the prebuilt ones with bound parameters.
+
+"prepare" is the Python work before the compiled SQL is found in the cache (building the statement and
+its cache key), "execute" is a whole session.execute round trip against the configured database.
+
+Usage: python -m benchmarks.hot_queries [--iterations N]
+Exits with status 1 if a prebuilt statement is not cheaper to prepare than the inline one.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import select
+
+from database.database import engine, async_session
+from database.models import User, Chat, Task, Executor
+from database.cruds.users import USER_BY_TELEGRAM_ID
+from database.cruds.chats import CHAT_BY_ID
+from database.cruds.tasks import TASK_BY_ID
+from database.cruds.executors import EXECUTOR_BY_USER_ID
+
+# name: (statement as built inline before, prebuilt statement, its parameter)
+LOOKUPS = {
+    "get_user_auth": (lambda key: select(User).where(User.telegram_id == key), USER_BY_TELEGRAM_ID, "telegram_id"),
+    "get_chat_object": (lambda key: select(Chat).where(Chat.id == key), CHAT_BY_ID, "db_chat_id"),
+    "get_task": (lambda key: select(Task).where(Task.task_id == key), TASK_BY_ID, "task_id"),
+    "get_executor": (lambda key: select(Executor).where(Executor.user_id == key), EXECUTOR_BY_USER_ID, "user_id"),
+}
+
+
+def prepare_inline(build, key):
+    build(key)._generate_cache_key()
+
+
+def prepare_prebuilt(stmt, key):
+    stmt._generate_cache_key()
+
+
+def time_prepare(prepare, stmt, iterations: int) -> float:
+    for key in range(min(iterations, 1000)):
+        prepare(stmt, key)
+
+    timings = []
+    for key in range(iterations):
+        started = time.perf_counter_ns()
+        prepare(stmt, key)
+        timings.append((time.perf_counter_ns() - started) / 1000)
+
+    return statistics.median(timings)
+
+
+async def time_execute(make_call, iterations: int) -> float:
+    async with async_session() as session:
+        for key in range(min(iterations, 200)):
+            (await session.execute(*make_call(key))).scalars().first()
+
+        timings = []
+        for key in range(iterations):
+            started = time.perf_counter_ns()
+            (await session.execute(*make_call(key))).scalars().first()
+            timings.append((time.perf_counter_ns() - started) / 1000)
+
+    return statistics.median(timings)
+
+
+async def run(iterations: int):
+    results = {}
+
+    for name, (build, stmt, param) in LOOKUPS.items():
+        results[name] = (
+            time_prepare(prepare_inline, build, iterations),
+            time_prepare(prepare_prebuilt, stmt, iterations),
+            await time_execute(lambda key: (build(key),), iterations),
+            await time_execute(lambda key: (stmt, {param: key}), iterations),
+        )
+
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine.echo = False
+    results = asyncio.run(run(args.iterations))
+
+    print(f"iterations: {args.iterations}, p50 per call in us")
+    print(f"{'lookup':<16} {'prepare inline':>15} {'prebuilt':>9} {'execute inline':>15} {'prebuilt':>9}")
+    slower = []
+    for name, (prepare_before, prepare_after, execute_before, execute_after) in results.items():
+        print(f"{name:<16} {prepare_before:>15.1f} {prepare_after:>9.1f} {execute_before:>15.1f} {execute_after:>9.1f}")
+        if prepare_after >= prepare_before:
+            slower.append(name)
+
+    if slower:
+        print(f"Prebuilt statements are not cheaper for: {', '.join(slower)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
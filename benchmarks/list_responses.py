@@ -0,0 +1,126 @@
+"""
+Cost of a list endpoint response (GET /users/default-users/) at growing row counts:
+ORM objects validated by FastAPI against the response model (the previous path) versus Core rows of
+the schema's columns serialized by pydantic-core (utils.row_response).
+
+Seeds up to the largest --sizes users (telegram ids from --user-id) in the configured database and
+deletes them at the end. Run it against a scratch database.
+
+Usage: python -m benchmarks.list_responses [--sizes N ...] [--repeats N]
+Exits with status 1 if the two paths produce different JSON.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import text
+
+from database.database import engine, async_session
+from database.cruds.users import get_default_users
+from routers.users.endpoints import USER_RESPONSE_COLUMNS
+from routers.users.schemes import UserResponseModel
+from utils.row_response import rows_response
+
+RESPONSE_FIELD = create_response_field(name="Response_bench", type_=List[UserResponseModel], mode="serialization")
+
+
+async def orm_path() -> bytes:
+    users = await get_default_users()
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=users)
+    return JSONResponse(content).body
+
+
+async def rows_path() -> bytes:
+    users = await get_default_users(USER_RESPONSE_COLUMNS)
+    return rows_response(users, UserResponseModel).body
+
+
+async def seed_users(first_id: int, start: int, stop: int):
+    async with async_session() as session:
+        await session.execute(
+            text("""
+                INSERT INTO users (telegram_id, telegram_username, username, chat_id, user_status, is_banned,
+                                   warning_count, salt, hashed_password, phone, email, date_added)
+                SELECT CAST(:first_id AS bigint) + n, 'bench_' || n, 'Bench user ' || n, CAST(:first_id AS bigint) + n, 'default', false,
+                       0, 'salt', 'hash', 'bench-' || n, 'bench' || n || '@example.com', now()
+                FROM generate_series(CAST(:start AS integer), CAST(:stop AS integer) - 1) AS n
+            """),
+            {"first_id": first_id, "start": start, "stop": stop}
+        )
+        await session.commit()
+
+
+async def delete_users(first_id: int, count: int):
+    async with async_session() as session:
+        await session.execute(
+            text("DELETE FROM users WHERE telegram_id >= CAST(:first_id AS bigint) AND telegram_id < CAST(:first_id AS bigint) + :count"),
+            {"first_id": first_id, "count": count}
+        )
+        await session.commit()
+
+
+async def measure(path, repeats: int):
+    best_wall, best_cpu, body = None, None, None
+
+    for _ in range(repeats):
+        wall, cpu = time.perf_counter(), time.process_time()
+        body = await path()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+
+    return best_wall * 1000, best_cpu * 1000, body
+
+
+async def run(sizes: List[int], repeats: int, first_id: int):
+    results, seeded = [], 0
+
+    try:
+        for size in sorted(sizes):
+            await seed_users(first_id, seeded, size)
+            seeded = size
+
+            await rows_path()
+            orm_wall, orm_cpu, orm_body = await measure(orm_path, repeats)
+            rows_wall, rows_cpu, rows_body = await measure(rows_path, repeats)
+
+            results.append((size, orm_wall, orm_cpu, rows_wall, rows_cpu, orm_body == rows_body))
+    finally:
+        await delete_users(first_id, seeded)
+        await engine.dispose()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--user-id", type=int, default=9_300_000_000)
+    args = parser.parse_args()
+
+    engine.echo = False
+    results = asyncio.run(run(args.sizes, args.repeats, args.user_id))
+
+    print("best of", args.repeats, "runs, ms (wall / CPU of this process)")
+    print(f"{'rows':>8} {'ORM + response_model':>22} {'Core rows + dump_json':>23} {'speedup':>8}")
+    mismatched = []
+    for size, orm_wall, orm_cpu, rows_wall, rows_cpu, same in results:
+        print(f"{size:>8} {orm_wall:>10.1f} / {orm_cpu:>9.1f} {rows_wall:>11.1f} / {rows_cpu:>9.1f} "
+              f"{orm_wall / rows_wall:>7.1f}x")
+        if not same:
+            mismatched.append(size)
+
+    if mismatched:
+        print(f"Responses differ at {', '.join(map(str, mismatched))} rows!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
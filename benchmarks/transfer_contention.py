@@ -0,0 +1,128 @@
+"""
+Throughput of create_money_transfer when many concurrent transfers hit the same sender.
+
+Seeds a sender, a receiver (--user-id and the next id) and a task (--task-id) in the configured
+database, funds the sender for exactly --funded transfers and fires --transfers of them,
+--concurrency at a time.
+Run it against a scratch database with DB_PROFILE=bench, so that neither SQL echo nor pool overflow skews the numbers.
+
+Usage: python -m benchmarks.transfer_contention [--transfers N] [--funded N] [--concurrency N]
+Exits with status 1 if the sender was overdrawn or the number of accepted transfers is wrong.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+from database.database import engine, async_session
+from database.cruds.balance import InsufficientFundsError
+from database.cruds.payments import create_money_transfer
+from utils.money import format_minor
+
+# Kopecks
+AMOUNT = 1000
+
+
+async def seed(sender_id: int, receiver_id: int, task_id: int, funds: int):
+    async with async_session() as session:
+        for user_id in (sender_id, receiver_id):
+            await session.execute(
+                text("""
+                    INSERT INTO users (telegram_id, telegram_username, username, chat_id, user_status, is_banned,
+                                       warning_count, salt, hashed_password, phone, email)
+                    VALUES (:id, 'bench', 'bench', :id, 'default', false, 0, '', '', :phone, '')
+                    ON CONFLICT DO NOTHING
+                """),
+                {"id": user_id, "phone": f"bench-{user_id}"}
+            )
+            await session.execute(
+                text("INSERT INTO balance (user_id, balance_money) VALUES (:id, 0) ON CONFLICT DO NOTHING"),
+                {"id": user_id}
+            )
+
+        await session.execute(
+            text("""
+                INSERT INTO executors (user_id, profile_state, work_examples, work_files_type)
+                VALUES (:id, 'accepted', '{}', '{}') ON CONFLICT DO NOTHING
+            """),
+            {"id": receiver_id}
+        )
+        await session.execute(
+            text("""
+                INSERT INTO tasks (task_id, client_id, status, price, subjects, work_type, proposed_by)
+                VALUES (:id, :client, 'active', 0, '{}', '{}', 'public') ON CONFLICT DO NOTHING
+            """),
+            {"id": task_id, "client": sender_id}
+        )
+        await session.execute(
+            text("UPDATE balance SET balance_money = :funds WHERE user_id = :id"),
+            {"id": sender_id, "funds": funds}
+        )
+
+        await session.commit()
+
+
+async def final_balance(user_id: int) -> int:
+    async with async_session() as session:
+        res = await session.execute(text("SELECT balance_money FROM balance WHERE user_id = :id"), {"id": user_id})
+        return res.scalar()
+
+
+async def run(transfers: int, funded: int, concurrency: int, sender_id: int, task_id: int):
+    receiver_id = sender_id + 1
+    funds = AMOUNT * funded
+    await seed(sender_id, receiver_id, task_id, funds)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, outcomes = [], {"accepted": 0, "rejected": 0}
+
+    async def transfer():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await create_money_transfer(receiver_id=receiver_id, sender_id=sender_id, task_id=task_id,
+                                            amount=AMOUNT)
+                outcomes["accepted"] += 1
+            except InsufficientFundsError:
+                outcomes["rejected"] += 1
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(transfer() for _ in range(transfers)))
+    elapsed = time.perf_counter() - started
+
+    return timings, outcomes, elapsed, funds, await final_balance(sender_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transfers", type=int, default=2000)
+    parser.add_argument("--funded", type=int, default=1500, help="Transfers the sender can afford")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--user-id", type=int, default=9_100_000_000)
+    parser.add_argument("--task-id", type=int, default=2_100_000_000)
+    args = parser.parse_args()
+
+    engine.echo = False
+    timings, outcomes, elapsed, funds, balance = asyncio.run(
+        run(args.transfers, args.funded, args.concurrency, args.user_id, args.task_id)
+    )
+
+    timings.sort()
+    print(f"transfers: {args.transfers}, concurrency: {args.concurrency}, elapsed: {elapsed:.2f} s")
+    print(f"throughput: {args.transfers / elapsed:.0f} transfers/s")
+    print(f"latency p50: {statistics.median(timings):.1f} ms, p99: {timings[int(len(timings) * 0.99) - 1]:.1f} ms")
+    print(f"accepted: {outcomes['accepted']}, rejected: {outcomes['rejected']}, "
+          f"sender balance: {format_minor(funds)} -> {format_minor(balance)}")
+
+    expected_accepted = min(args.transfers, args.funded)
+    if balance < 0 or outcomes["accepted"] != expected_accepted or balance != funds - AMOUNT * expected_accepted:
+        print("Inconsistent result!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-callback cost of the Monobank webhook receiver before it touches the database:
+X-Sign verification against the cached merchant key plus strict parsing of the raw body.
+
+Usage: python -m benchmarks.webhook_receiver [--iterations N] [--budget-us US]
+Exits with status 1 when the median cost exceeds the budget.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import sys
+import time
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from routers.webhooks.schemes import MonobankWebhookPayload
+from utils.monobank_signature import MonobankPublicKeyCache, verify_monobank_signature
+
+
+def make_callback(private_key: ec.EllipticCurvePrivateKey):
+    body = json.dumps({
+        "invoiceId": "p2_9ZgpZVsl3",
+        "status": "success",
+        "amount": 4200,
+        "ccy": 980,
+        "finalAmount": 4200,
+        "reference": "84d0070ee4e44667b31371d8f8813947",
+        "createdDate": "2024-02-06T19:13:44Z",
+        "modifiedDate": "2024-02-06T19:14:02Z"
+    }).encode()
+    x_sign = base64.b64encode(private_key.sign(body, ec.ECDSA(hashes.SHA256()))).decode()
+
+    return body, x_sign
+
+
+async def receive(body: bytes, x_sign: str, key_cache: MonobankPublicKeyCache):
+    if not await verify_monobank_signature(body, x_sign, key_cache):
+        raise ValueError("Signature mismatch")
+
+    return MonobankWebhookPayload.model_validate_json(body)
+
+
+async def run(iterations: int):
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    key_cache = MonobankPublicKeyCache(api_url="", token=None, ttl=3600, min_refresh=60)
+    key_cache.set_key(private_key.public_key())
+
+    body, x_sign = make_callback(private_key)
+
+    for _ in range(min(iterations, 1000)):
+        await receive(body, x_sign, key_cache)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        await receive(body, x_sign, key_cache)
+        timings.append((time.perf_counter_ns() - started) / 1000)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--budget-us", type=float, default=250.0)
+    args = parser.parse_args()
+
+    timings = sorted(asyncio.run(run(args.iterations)))
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+
+    print(f"iterations: {args.iterations}")
+    print(f"p50: {p50:.1f} us, p99: {p99:.1f} us, budget: {args.budget_us:.1f} us")
+
+    if p50 > args.budget_us:
+        print("Over budget!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,40 @@
-import decimal
 import enum
+import os
+from typing import Dict, List, Union, Optional
 
-from sqlalchemy import select, update
+from dotenv import load_dotenv
+from sqlalchemy import select, update, outerjoin, true, func, exists, ColumnElement, Update
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
-from sqlalchemy.dialects.postgresql import array, insert
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.database import async_session
-from database.models import Balance
-from utils.card_tokenization import encrypt_card_number, decrypt_card_number
+from database.cruds.ledger import record_movement
+from database.models import Balance, UserCard, LedgerAccount, LedgerReason
+from utils.card_tokenization import encrypt_card_number, decrypt_card_number, mask_card_number, card_fingerprint
+from utils.lru_cache import LRUCache
+
+load_dotenv()
+
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", 10000))
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", 10))
+
+# Per-process read-through cache of get_user_balance results keyed by user_id. Mutations done by this
+# process evict entries after commit; changes made by other processes show up within the TTL.
+balance_cache = LRUCache(maxsize=BALANCE_CACHE_SIZE, ttl=BALANCE_CACHE_TTL)
+
+
+class BalanceFill:
+    """A get_user_balance query in flight, whose result may only be cached while it is not stale."""
+
+    __slots__ = ("stale",)
+
+    def __init__(self):
+        self.stale = False
+
+
+# Queries of balances being read into the cache, by user_id
+balance_fills: Dict[int, List[BalanceFill]] = {}
 
 
 class BalanceAction(enum.StrEnum):
@@ -15,49 +42,171 @@ class BalanceAction(enum.StrEnum):
     withdrawal: str = "withdrawal"
 
 
-async def update_balance(
+class InsufficientFundsError(ValueError):
+    pass
+
+
+def forget_balance(user_id: int):
+    """
+    Evict the balance of a user after a committed change. Reads already in flight may have loaded the
+    old row, so they are marked stale and do not put it back into the cache.
+    """
+    balance_cache.pop(user_id)
+
+    for fill in balance_fills.get(user_id, ()):
+        fill.stale = True
+
+
+def copy_balance(balance: Balance) -> Balance:
+    # Callers get their own object, the cached one is never handed out
+    return Balance(user_id=balance.user_id, balance_money=balance.balance_money, user_cards=list(balance.user_cards))
+
+
+def credit_balance_stmt(user_id: int, amount: Union[int, ColumnElement]) -> Update:
+    return (
+        update(Balance)
+        .where(Balance.user_id == user_id)
+        .values(balance_money=Balance.balance_money + amount)
+        .returning(Balance.balance_money)
+    )
+
+
+def debit_balance_stmt(user_id: int, amount: Union[int, ColumnElement]) -> Update:
+    return (
+        update(Balance)
+        .where((Balance.user_id == user_id) & (Balance.balance_money >= amount))
+        .values(balance_money=Balance.balance_money - amount)
+        .returning(Balance.balance_money)
+    )
+
+
+async def execute_balance_change(
+        session: AsyncSession,
         user_id: int,
-        amount: decimal.Decimal,
+        amount: int,
         action: BalanceAction
-):
-    try:
-        async with async_session() as session:
-            balance = await session.execute(
-                select(Balance).where(Balance.user_id == user_id)
-            )
+) -> int:
+    """
+    Credit or debit a balance inside the caller's transaction with a single UPDATE ... RETURNING.
 
-            balance = balance.scalars().first()
+    A debit only applies when the balance covers the amount. It is wrapped in a SELECT of the row as it
+    was before the statement, so one returned row tells a missing account (no row) apart from
+    insufficient funds (no new balance) without a second round trip.
 
-            if not balance:
-                raise InvalidRequestError
+    Returns the new balance; raises InvalidRequestError if the account does not exist and
+    InsufficientFundsError if a debit is not covered.
+    """
+    if action == BalanceAction.replenishment:
+        res = await session.execute(credit_balance_stmt(user_id, amount))
+        new_balance = res.scalar()
 
-            if action == BalanceAction.replenishment:
-                balance.balance_money += amount
-            elif action == BalanceAction.withdrawal:
-                balance.balance_money -= amount
+        if new_balance is None:
+            raise InvalidRequestError(f"Balance account of user {user_id} does not exist")
+        return new_balance
 
-            await session.commit()
+    debit = debit_balance_stmt(user_id, amount).cte("debit")
 
-    except IntegrityError:
-        await session.rollback()
+    res = await session.execute(
+        select(Balance.balance_money, debit.c.balance_money.label("new_balance"))
+        .select_from(outerjoin(Balance, debit, true()))
+        .where(Balance.user_id == user_id)
+    )
+    row = res.first()
 
+    if row is None:
+        raise InvalidRequestError(f"Balance account of user {user_id} does not exist")
+    if row.new_balance is None:
+        raise InsufficientFundsError(f"Balance {row.balance_money} is less than {amount} kopecks")
+    return row.new_balance
+
+
+async def update_balance(
+        user_id: int,
+        amount: int,
+        action: BalanceAction
+) -> int:
+    signed_amount = amount if action == BalanceAction.replenishment else -amount
+
+    async with async_session() as session:
+        new_balance = await execute_balance_change(session, user_id, amount, action)
+        await record_movement(
+            session,
+            [(LedgerAccount.user, user_id, signed_amount), (LedgerAccount.external, None, -signed_amount)],
+            LedgerReason.adjustment
+        )
+        await session.commit()
+
+    forget_balance(user_id)
+    return new_balance
+
+
+async def get_user_balance(user_id: int, with_pan: bool = False) -> Optional[Balance]:
+    """
+    Load the balance of a user with the cards in masked form, read through the balance cache.
+
+    Parameters:
+    - user_id: The owner of the balance.
+    - with_pan: Decrypt and return full card numbers instead. Never cached, use only where the
+      PAN is really needed.
+
+    Returns:
+    A detached Balance or None if the user has no balance account.
+    """
+    if not with_pan:
+        cached = balance_cache.get(user_id)
+        if cached is not None:
+            return copy_balance(cached)
+
+    card_column = UserCard.encrypted_card if with_pan else UserCard.masked_card
+    cards = (
+        select(func.array_agg(aggregate_order_by(card_column, UserCard.card_id)))
+        .where(UserCard.user_id == Balance.user_id)
+        .scalar_subquery()
+    )
+
+    fill = BalanceFill()
+    balance_fills.setdefault(user_id, []).append(fill)
 
-async def get_user_balance(user_id: int) -> Balance:
     try:
         async with async_session() as session:
             result = await session.execute(
-                select(Balance).where(
+                select(Balance.user_id, Balance.balance_money, cards.label("cards")).where(
                     Balance.user_id == user_id
                 )
             )
 
-            balance_data = result.scalars().first()
-
-            balance_data.user_cards = [decrypt_card_number(card) for card in balance_data.user_cards]
+            balance_data = result.first()
 
-            return balance_data
+            if not balance_data:
+                return None
     except IntegrityError:
         await session.rollback()
+        return None
+    finally:
+        fills = balance_fills[user_id]
+        fills.remove(fill)
+        if not fills:
+            del balance_fills[user_id]
+
+    cards = balance_data.cards or []
+
+    if with_pan:
+        return Balance(
+            user_id=balance_data.user_id,
+            balance_money=balance_data.balance_money,
+            user_cards=[decrypt_card_number(card) for card in cards]
+        )
+
+    balance = Balance(user_id=balance_data.user_id, balance_money=balance_data.balance_money, user_cards=cards)
+
+    # A change committed while the query ran may not be in this row
+    if not fill.stale:
+        balance_cache.set(user_id, copy_balance(balance))
+    return balance
+
+
+def get_balance_cache_stats() -> dict:
+    return balance_cache.stats()
 
 
 async def create_user_balance(user_id: int):
@@ -66,35 +215,31 @@ async def create_user_balance(user_id: int):
             session.add(
                 Balance(
                     user_id=user_id,
-                    balance_money=0.00,
-                    user_cards=[]
+                    balance_money=0
                 )
             )
             await session.commit()
     except IntegrityError:
         print("Error with adding user")
         raise
+    finally:
+        forget_balance(user_id)
 
 
 async def update_user_cards(user_id: int, card: str):
     try:
         async with async_session() as session:
-
-            card = encrypt_card_number(card)
-
-            stmt = insert(Balance).values(user_id=user_id, user_cards=[card])
-
-            do_update_stmt = stmt.on_conflict_do_update(
-                index_elements=['user_id'],
-                set_={
-                    'user_cards': Balance.user_cards.op('||')(array([card], type_="BLOB"))
-                },
-                where=(~Balance.user_cards.contains(array([card], type_="BLOB")))
+            await session.execute(
+                insert(UserCard).values(
+                    user_id=user_id,
+                    fingerprint=card_fingerprint(card),
+                    encrypted_card=encrypt_card_number(card),
+                    masked_card=mask_card_number(card)
+                ).on_conflict_do_nothing(constraint="uq_user_cards_fingerprint")
             )
-
-            await session.execute(do_update_stmt)
             await session.commit()
 
+            forget_balance(user_id)
             return True
     except IntegrityError:
         await session.rollback()
@@ -102,24 +247,53 @@ async def update_user_cards(user_id: int, card: str):
     return False
 
 
+async def check_user_card(user_id: int, card: str) -> bool:
+    async with async_session() as session:
+        res = await session.execute(
+            select(
+                exists().where((UserCard.user_id == user_id) & (UserCard.fingerprint == card_fingerprint(card)))
+            )
+        )
+
+        return res.scalar()
+
+
 async def set_new_balance(
         user_id: int,
-        new_amount: decimal.Decimal
-):
+        new_amount: int
+) -> int:
     try:
         async with async_session() as session:
+            res = await session.execute(
+                select(Balance.balance_money).where(Balance.user_id == user_id).with_for_update()
+            )
+            old_balance = res.scalar()
 
-            balance = await session.execute(select(Balance).where(Balance.user_id == user_id))
-
-            if not balance.scalars().first():
-                raise InvalidRequestError
+            if old_balance is None:
+                raise InvalidRequestError(f"Balance account of user {user_id} does not exist")
 
-            await session.execute(
-                update(Balance).where(Balance.user_id == user_id).values(balance_money=new_amount)
+            res = await session.execute(
+                update(Balance)
+                .where(Balance.user_id == user_id)
+                .values(balance_money=new_amount)
+                .returning(Balance.balance_money)
             )
+            new_balance = res.scalar()
+
+            difference = new_balance - old_balance
+            if difference:
+                await record_movement(
+                    session,
+                    [(LedgerAccount.user, user_id, difference), (LedgerAccount.external, None, -difference)],
+                    LedgerReason.adjustment,
+                    reference="reset"
+                )
 
             await session.commit()
 
+        forget_balance(user_id)
+        return new_balance
+
     except IntegrityError:
         print("Unsuccessfully updated balance")
         raise
@@ -1,14 +1,19 @@
-from typing import List, Optional, Any, Dict, AnyStr
+from typing import List, Optional, Any, Dict, AnyStr, Sequence
 from datetime import datetime, timedelta
 
 from aiogram.enums import ChatType
 
-from sqlalchemy import select, update, and_, asc, or_
+from sqlalchemy import select, update, and_, asc, or_, bindparam
 from sqlalchemy.exc import IntegrityError
 from database.database import async_session
 
 from database.models import Chat, User, Task
 
+# Hot lookups of get_chat_object, built once (see USER_BY_TELEGRAM_ID in database.cruds.users)
+CHAT_BY_ID = select(Chat).where(Chat.id == bindparam("db_chat_id"))
+CHAT_BY_SUPERGROUP_ID = select(Chat).where(Chat.supergroup_id == bindparam("supergroup_id"))
+CHAT_BY_CHAT_ID = select(Chat).where(Chat.chat_id == bindparam("chat_id"))
+
 
 async def save_chat_data(
         chat_id: int,
@@ -96,20 +101,14 @@ async def get_chat_object(
                 raise ValueError("chat_id or db_chat_id has to be specified!")
 
             if db_chat_id:
-                res = await session.execute(
-                    select(Chat).where(Chat.id == db_chat_id)
-                )
+                res = await session.execute(CHAT_BY_ID, {"db_chat_id": db_chat_id})
                 return res.scalars().first()
 
             if supergroup_id:
-                res = await session.execute(
-                    select(Chat).where(Chat.supergroup_id == supergroup_id)
-                )
+                res = await session.execute(CHAT_BY_SUPERGROUP_ID, {"supergroup_id": supergroup_id})
                 return res.scalars().first()
 
-            res = await session.execute(
-                select(Chat).where(Chat.chat_id == chat_id)
-            )
+            res = await session.execute(CHAT_BY_CHAT_ID, {"chat_id": chat_id})
 
             return res.scalars().first()
 
@@ -202,9 +201,10 @@ async def update_chat_fields(db_chat_id: int, fields: Dict[AnyStr, Any]):
         await session.rollback()
 
 
-async def get_unused_chats(hours: int = 12):
+async def get_unused_chats(hours: int = 12, columns: Optional[Sequence] = None):
+    """Chats free to be reused: as Chat objects, or as rows of just `columns` (Chat attributes) when given."""
     async with async_session() as session:
-        stmt = select(Chat).where(
+        stmt = select(*columns or [Chat]).where(
             or_(
                 and_(
                     (Chat.in_use == False),
@@ -221,7 +221,7 @@ async def get_unused_chats(hours: int = 12):
 
         chats = await session.execute(stmt)
 
-        return chats.scalars().all()
+        return chats.all() if columns else chats.scalars().all()
 
 
 async def check_chat_existence(
@@ -1,11 +1,14 @@
-from typing import List
+from typing import List, Optional, Sequence
 
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, and_, bindparam
 from sqlalchemy.exc import IntegrityError
 
-from database.database import async_session
+from database.database import async_session, read_only
 from database.models import TaskStatus, Task, Executor, User, FileType, ProfileStatus, Chat
 
+# Hot lookup of get_executor, built once (see USER_BY_TELEGRAM_ID in database.cruds.users)
+EXECUTOR_BY_USER_ID = select(Executor).where(Executor.user_id == bindparam("user_id"))
+
 
 async def get_executor_orders(
         executor_id: int,
@@ -36,9 +39,7 @@ async def get_executor(
 ):
     try:
         async with async_session() as session:
-            result = await session.execute(
-                select(Executor).where(Executor.user_id == user_id)
-            )
+            result = await session.execute(EXECUTOR_BY_USER_ID, {"user_id": user_id})
 
             return result.scalars().first()
     except IntegrityError:
@@ -46,16 +47,19 @@ async def get_executor(
         print("Cant get executor!")
 
 
-async def get_all_executors_profiles(*args):
+@read_only
+async def get_all_executors_profiles(*args, columns: Optional[Sequence] = None):
+    """Users with an accepted executor profile: as User objects, or as rows of just `columns` when given."""
     try:
         async with async_session() as session:
             result = await session.execute(
-                select(User).join(Executor, User.telegram_id == Executor.user_id).where(
-                    Executor.profile_state == ProfileStatus.accepted
-                )
+                select(*columns or [User])
+                .select_from(User)
+                .join(Executor, User.telegram_id == Executor.user_id)
+                .where(Executor.profile_state == ProfileStatus.accepted)
             )
 
-            return result.scalars().all()
+            return result.all() if columns else result.scalars().all()
     except IntegrityError:
         print("Error with getting data!")
         await session.rollback()
@@ -106,6 +110,7 @@ async def update_executor_application_status(
         print("Wrong params for executor status updating")
 
 
+@read_only
 async def get_executor_applications():
     try:
         async with async_session() as session:
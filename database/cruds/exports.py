@@ -0,0 +1,149 @@
+import csv
+import enum
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional, Union, BinaryIO, Callable, Awaitable
+
+from dotenv import load_dotenv
+from sqlalchemy import select, cast, String, Numeric, Select, ColumnElement
+
+from database.database import engine, async_session
+from database.models import Transaction, TransactionType, TransactionStatus, WithdrawalRequest, WithdrawalStatus
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+
+
+class ExportFormat(enum.StrEnum):
+    csv: str = "csv"
+    ndjson: str = "ndjson"
+
+
+def hryvnias(column: ColumnElement) -> ColumnElement:
+    # Kopecks as an exact two-place decimal, computed by Postgres so both export paths print the same text
+    return cast(cast(column, Numeric) / 100, Numeric(14, 2))
+
+
+def transactions_export_stmt(
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        transaction_type: Optional[TransactionType] = None,
+        transaction_status: Optional[TransactionStatus] = None
+) -> Select:
+    conditions = []
+    if date_from is not None:
+        conditions.append(Transaction.transaction_date >= date_from)
+    if date_to is not None:
+        conditions.append(Transaction.transaction_date < date_to)
+    if transaction_type is not None:
+        conditions.append(Transaction.transaction_type == transaction_type)
+    if transaction_status is not None:
+        conditions.append(Transaction.transaction_status == transaction_status)
+
+    return (
+        select(
+            Transaction.transaction_id,
+            Transaction.invoice_id,
+            Transaction.sender_id,
+            Transaction.receiver_id,
+            Transaction.task_id,
+            hryvnias(Transaction.amount).label("amount"),
+            hryvnias(Transaction.commission).label("commission"),
+            cast(Transaction.transaction_type, String).label("transaction_type"),
+            cast(Transaction.transaction_status, String).label("transaction_status"),
+            Transaction.transaction_date
+        )
+        .where(*conditions)
+        .order_by(Transaction.transaction_id)
+    )
+
+
+def withdrawals_export_stmt(
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        status: Optional[WithdrawalStatus] = None
+) -> Select:
+    conditions = []
+    if date_from is not None:
+        conditions.append(WithdrawalRequest.request_date >= date_from)
+    if date_to is not None:
+        conditions.append(WithdrawalRequest.request_date < date_to)
+    if status is not None:
+        conditions.append(WithdrawalRequest.status == status)
+
+    return (
+        select(
+            WithdrawalRequest.request_id,
+            WithdrawalRequest.user_id,
+            hryvnias(WithdrawalRequest.amount).label("amount"),
+            hryvnias(WithdrawalRequest.commission).label("commission"),
+            cast(WithdrawalRequest.status, String).label("status"),
+            WithdrawalRequest.payment_method,
+            WithdrawalRequest.request_date,
+            WithdrawalRequest.processed_date,
+            WithdrawalRequest.admin_id
+        )
+        .where(*conditions)
+        .order_by(WithdrawalRequest.request_id)
+    )
+
+
+async def stream_export(
+        stmt: Select,
+        export_format: ExportFormat,
+        batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """
+    Rows of an export statement as CSV (with a header line) or NDJSON text, one chunk per batch.
+
+    Rows come through a server-side cursor `batch_size` at a time and are never turned into ORM
+    objects, so memory stays bounded by one batch whatever the size of the export.
+    """
+    async with async_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+
+        if export_format == ExportFormat.csv:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(columns)
+
+            async for rows in result.partitions():
+                writer.writerows(rows)
+                yield buffer.getvalue()
+
+                buffer.seek(0)
+                buffer.truncate()
+
+            # Header of an empty export
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+
+async def copy_export(
+        stmt: Select,
+        output: Union[str, BinaryIO, Callable[[bytes], Awaitable]]
+) -> int:
+    """
+    CSV export with a header line through COPY ... TO STDOUT: Postgres formats the rows and they are
+    passed to `output` (a path, a binary file or a coroutine function taking bytes) without being parsed.
+
+    Returns the number of rows exported.
+    """
+    # COPY takes no bind parameters; the filters are enums and datetimes rendered by SQLAlchemy
+    query = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        status = await raw_connection.driver_connection.copy_from_query(
+            query, output=output, format="csv", header=True
+        )
+
+    # Command tag "COPY <rows>"
+    return int(status.split()[-1])
@@ -0,0 +1,187 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import select, insert, func, literal, union_all, null, BIGINT, CTE, ColumnElement, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import async_session
+from database.models import LedgerEntry, LedgerAccount, LedgerReason, BalanceSnapshot
+
+# Key of the advisory lock that lets only one app node take snapshots at a time
+SNAPSHOT_LOCK_KEY = 0x6c656467
+
+# (account, user_id or None for house accounts, signed amount in kopecks)
+LedgerLeg = Tuple[LedgerAccount, Optional[int], int]
+
+
+class UnbalancedMovementError(ValueError):
+    pass
+
+
+async def record_movement(
+        session: AsyncSession,
+        legs: List[LedgerLeg],
+        reason: LedgerReason,
+        reference: Optional[str] = None
+) -> uuid.UUID:
+    """
+    Append the legs of one money movement to the ledger inside the caller's transaction.
+
+    Raises UnbalancedMovementError if the legs do not sum to zero.
+    """
+    total = sum(amount for _, _, amount in legs)
+    if total != 0:
+        raise UnbalancedMovementError(f"Legs of a {reason} movement sum to {total}")
+
+    movement_id = uuid.uuid4()
+
+    await session.execute(
+        insert(LedgerEntry),
+        [
+            {
+                "movement_id": movement_id,
+                "account": account,
+                "user_id": user_id,
+                "amount": amount,
+                "reason": reason,
+                "reference": reference
+            }
+            for account, user_id, amount in legs
+        ]
+    )
+
+    return movement_id
+
+
+def ledger_leg(
+        movement_id: ColumnElement,
+        account: LedgerAccount,
+        user_id: Optional[Union[int, ColumnElement]],
+        amount: ColumnElement,
+        reason: LedgerReason,
+        reference: Optional[ColumnElement] = None
+) -> Select:
+    """
+    One leg of a movement computed in SQL, for ledger_entries_cte. Add .select_from()/.where() to take
+    the amount and reference from the rows of another CTE.
+    """
+    return select(
+        movement_id,
+        literal(account, LedgerEntry.account.type),
+        user_id if isinstance(user_id, ColumnElement) else literal(user_id, BIGINT),
+        amount,
+        literal(reason, LedgerEntry.reason.type),
+        reference if reference is not None else null()
+    )
+
+
+def ledger_entries_cte(name: str, *legs: Select) -> CTE:
+    """
+    Ledger insert to be attached with add_cte() to the statement that moves the money, so the entries
+    are written in the same round trip. The caller is responsible for the legs summing to zero.
+    """
+    return insert(LedgerEntry).from_select(
+        ["movement_id", "account", "user_id", "amount", "reason", "reference"], union_all(*legs)
+    ).cte(name)
+
+
+def new_movement_id() -> ColumnElement:
+    return literal(uuid.uuid4(), LedgerEntry.movement_id.type)
+
+
+def deposit_entries_cte(user_id: int, credited: CTE) -> CTE:
+    """
+    Ledger insert for external payments credited to a user, to be attached to the statement that
+    produces `credited` (a CTE with invoice_id and amount columns). Every invoice gets a user leg and
+    an external leg; all of them share one movement.
+    """
+    movement_id = new_movement_id()
+
+    return ledger_entries_cte(
+        "deposit_entries",
+        ledger_leg(movement_id, LedgerAccount.user, user_id, credited.c.amount, LedgerReason.deposit,
+                   credited.c.invoice_id).select_from(credited),
+        ledger_leg(movement_id, LedgerAccount.external, None, -credited.c.amount, LedgerReason.deposit,
+                   credited.c.invoice_id).select_from(credited)
+    )
+
+
+async def take_balance_snapshots(settle: float) -> int:
+    """
+    Snapshot the balance of every user whose ledger moved since the previous snapshot run.
+
+    The snapshot is taken as of `settle` seconds ago, so entries of transactions still in flight
+    (created_at is the transaction start time) are not left out. Only one caller at a time does the
+    work; concurrent calls return 0.
+
+    Returns the number of snapshots written.
+    """
+    async with async_session() as session:
+        locked = await session.execute(select(func.pg_try_advisory_xact_lock(SNAPSHOT_LOCK_KEY)))
+        if not locked.scalar():
+            return 0
+
+        as_of = (await session.execute(select(func.localtimestamp() - timedelta(seconds=settle)))).scalar()
+        previous_as_of = (await session.execute(select(func.max(BalanceSnapshot.as_of)))).scalar()
+
+        conditions = [(LedgerEntry.account == LedgerAccount.user), (LedgerEntry.created_at <= as_of)]
+        if previous_as_of is not None:
+            if previous_as_of >= as_of:
+                return 0
+            conditions.append(LedgerEntry.created_at > previous_as_of)
+
+        deltas = (
+            select(LedgerEntry.user_id, func.sum(LedgerEntry.amount).label("delta"))
+            .where(*conditions)
+            .group_by(LedgerEntry.user_id)
+            .subquery()
+        )
+
+        last_snapshot = (
+            select(BalanceSnapshot.balance_money)
+            .where(BalanceSnapshot.user_id == deltas.c.user_id)
+            .order_by(BalanceSnapshot.as_of.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        res = await session.execute(
+            insert(BalanceSnapshot).from_select(
+                ["user_id", "as_of", "balance_money"],
+                select(deltas.c.user_id, literal(as_of), func.coalesce(last_snapshot, 0) + deltas.c.delta)
+            )
+        )
+
+        await session.commit()
+        return res.rowcount
+
+
+async def get_user_balance_at(
+        user_id: int,
+        moment: datetime
+) -> int:
+    """
+    Balance of a user at a point in time: the latest snapshot before it plus the ledger tail after it.
+    """
+    async with async_session() as session:
+        res = await session.execute(
+            select(BalanceSnapshot.as_of, BalanceSnapshot.balance_money)
+            .where((BalanceSnapshot.user_id == user_id) & (BalanceSnapshot.as_of <= moment))
+            .order_by(BalanceSnapshot.as_of.desc())
+            .limit(1)
+        )
+        snapshot = res.first()
+
+        conditions = [
+            (LedgerEntry.account == LedgerAccount.user),
+            (LedgerEntry.user_id == user_id),
+            (LedgerEntry.created_at <= moment)
+        ]
+        if snapshot is not None:
+            conditions.append(LedgerEntry.created_at > snapshot.as_of)
+
+        res = await session.execute(select(func.coalesce(func.sum(LedgerEntry.amount), 0)).where(*conditions))
+        tail = res.scalar()
+
+    return (snapshot.balance_money if snapshot is not None else 0) + tail
@@ -0,0 +1,127 @@
+import os
+import re
+from datetime import date, datetime
+from typing import Iterable, List, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import async_session
+
+load_dotenv()
+
+# Monthly partitions kept ready after the current one
+TRANSACTION_PARTITIONS_AHEAD = int(os.getenv("TRANSACTION_PARTITIONS_AHEAD", 3))
+# Months of history (including the current one) kept attached; 0 never detaches anything
+TRANSACTION_PARTITIONS_RETAIN = int(os.getenv("TRANSACTION_PARTITIONS_RETAIN", 0))
+# Partition DDL gives up instead of queueing behind long transactions; the next run retries
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+
+# Key of the advisory lock that lets only one app node change partitions at a time
+PARTITION_LOCK_KEY = 0x70617274
+
+PARTITION_NAME = re.compile(r"^transactions_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def transaction_partition_name(month: date) -> str:
+    return f"transactions_p{month:%Y%m}"
+
+
+async def list_transaction_partitions(session: AsyncSession) -> List[Tuple[str, date]]:
+    """Attached partitions of transactions as (name, first day of the month), oldest first."""
+    res = await session.execute(
+        text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'transactions'::regclass
+        """)
+    )
+
+    partitions = []
+    for name in res.scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match[1]), int(match[2]), 1)))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def create_transaction_partition(session: AsyncSession, month: date):
+    await session.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {transaction_partition_name(month)} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+    )
+
+
+async def ensure_transaction_months(months: Iterable[date]) -> List[str]:
+    """
+    Create the partitions of the given months (first days) that do not exist yet, e.g. before
+    loading historical transactions. Returns the names of the created partitions.
+    """
+    async with async_session() as session:
+        existing = {month for _, month in await list_transaction_partitions(session)}
+        missing = sorted(set(months) - existing)
+        if not missing:
+            return []
+
+        await session.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        for month in missing:
+            await create_transaction_partition(session, month)
+
+        await session.commit()
+
+    return [transaction_partition_name(month) for month in missing]
+
+
+async def maintain_transaction_partitions(
+        months_ahead: int = TRANSACTION_PARTITIONS_AHEAD,
+        retain_months: int = TRANSACTION_PARTITIONS_RETAIN
+) -> Tuple[List[str], List[str]]:
+    """
+    Create the partitions of transactions for the current month and `months_ahead` months after it,
+    and detach the ones older than `retain_months` months.
+
+    Detached partitions stay in the database as standalone tables for archiving; queries on
+    transactions (and balance reconciliation) no longer see their rows. Only one caller at a time
+    does the work; concurrent calls return nothing.
+
+    Returns the names of the created and of the detached partitions.
+    """
+    async with async_session() as session:
+        locked = await session.execute(select(func.pg_try_advisory_xact_lock(PARTITION_LOCK_KEY)))
+        if not locked.scalar():
+            return [], []
+
+        await session.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+
+        current_month = datetime.utcnow().date().replace(day=1)
+        partitions = await list_transaction_partitions(session)
+        existing = {month for _, month in partitions}
+
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current_month, offset)
+            if month not in existing:
+                await create_transaction_partition(session, month)
+                created.append(transaction_partition_name(month))
+
+        detached = []
+        if retain_months > 0:
+            oldest_kept = add_months(current_month, 1 - retain_months)
+            for name, month in partitions:
+                if month < oldest_kept:
+                    await session.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+                    detached.append(name)
+
+        await session.commit()
+
+    return created, detached
@@ -1,13 +1,31 @@
-import decimal
+import asyncio
+import enum
+import os
 from datetime import datetime
+from functools import partial
+from typing import List, Tuple, Optional, Callable, Awaitable, Dict, Set
 from uuid import uuid1
 
-from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
 
-from sqlalchemy import select, update, and_
+from sqlalchemy.exc import IntegrityError, InvalidRequestError, DBAPIError
 
-from database.database import async_session, COMMISSION
-from database.models import Transaction, TransactionStatus, Task, TaskStatus, Balance, TransactionType, Chat
+from sqlalchemy import select, update, insert, and_, literal, exists, outerjoin, true, func, BIGINT, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.cruds.balance import forget_balance, credit_balance_stmt, debit_balance_stmt, InsufficientFundsError
+from database.cruds.ledger import ledger_entries_cte, ledger_leg, new_movement_id
+from database.database import async_session
+from database.models import Transaction, TransactionStatus, Task, TaskStatus, TransactionType, Chat, Balance, \
+    LedgerAccount, LedgerReason
+from utils.money import commission_of
+
+load_dotenv()
+
+PAYMENT_POLL_INTERVAL = float(os.getenv("PAYMENT_POLL_INTERVAL", 0.5))
+
+# Long-polling waiters of this process, keyed by (task_id, receiver_id, sender_id)
+payment_waiters: Dict[Tuple[int, int, int], Set[asyncio.Event]] = {}
 
 
 async def check_successful_payment(
@@ -18,112 +36,367 @@ async def check_successful_payment(
     try:
         async with async_session() as session:
             res = await session.execute(
-                select(Transaction).where(
-                    (Transaction.task_id == task_id) & (Transaction.sender_id == sender_id) & (
-                            Transaction.receiver_id == receiver_id)
+                select(
+                    exists().where(
+                        (Transaction.task_id == task_id) & (Transaction.sender_id == sender_id) &
+                        (Transaction.receiver_id == receiver_id) &
+                        (Transaction.transaction_status != TransactionStatus.failed)
+                    )
                 )
             )
 
-            return True if res.scalars().all() else False
+            return res.scalar()
     except IntegrityError as err:
         print(err)
         await session.rollback()
 
 
-async def accept_done_offer(
-        transaction_id,
-        task_id,
-        receiver_id,
-):
+def notify_payment(task_id: int, receiver_id: int, sender_id: int):
+    for event in payment_waiters.get((task_id, receiver_id, sender_id), ()):
+        event.set()
+
+
+async def wait_for_payment(
+        task_id: int,
+        receiver_id: int,
+        sender_id: int,
+        timeout: float,
+        poll_interval: float = PAYMENT_POLL_INTERVAL
+) -> bool:
+    """
+    Long-poll check_successful_payment for up to `timeout` seconds.
+
+    Transfers made by this process wake the waiter right away; payments written by other processes
+    are picked up by re-checking every `poll_interval` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    key = (task_id, receiver_id, sender_id)
+    event = asyncio.Event()
+    payment_waiters.setdefault(key, set()).add(event)
+
     try:
-        async with async_session() as session:
+        while True:
+            if await check_successful_payment(task_id, receiver_id, sender_id):
+                return True
 
-            transaction = await session.execute(
-                select(Transaction).where(Transaction.transaction_id == transaction_id)
-            )
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
 
-            transaction = transaction.scalars().first()
-            transaction.transaction_status = TransactionStatus.completed
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(poll_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+    finally:
+        waiters = payment_waiters[key]
+        waiters.discard(event)
+        if not waiters:
+            del payment_waiters[key]
 
-            await session.execute(
-                update(Task).where(Task.task_id == task_id).values(
-                    status=TaskStatus.done
-                )
-            )
 
-            await session.execute(
-                update(Chat).where(
-                    and_(
-                        Chat.task_id == task_id,
-                        Chat.executor_id == transaction.receiver_id,
-                        Chat.client_id == transaction.sender_id
-                    )
-                ).values(
-                    is_payed=True,
-                    payment_date=datetime.utcnow()
-                )
-            )
+async def execute_accept_offer(
+        session: AsyncSession,
+        transaction_id: int,
+        task_id: int,
+        receiver_id: int
+) -> Row:
+    """
+    Release the escrowed payment of a task to the executor in one statement, inside the caller's
+    transaction.
+
+    The transfer is flipped to Completed only if it is still Pending; the task is marked done, the
+    chat of the task stamped as paid, the receiver credited and the ledger written by the same
+    data-modifying CTE, all conditional on that flip. A retry of an already accepted offer changes
+    nothing and is reported as an error.
+
+    Returns the completed transaction id, the new balance of the receiver and the number of chats
+    marked paid; raises InvalidRequestError if the transaction is not pending or the receiver has no
+    balance account.
+    """
+    accepted = (
+        update(Transaction)
+        .where(
+            (Transaction.transaction_id == transaction_id) &
+            (Transaction.transaction_status == TransactionStatus.pending)
+        )
+        .values(transaction_status=TransactionStatus.completed)
+        .returning(Transaction.transaction_id, Transaction.invoice_id, Transaction.sender_id,
+                   Transaction.receiver_id, Transaction.amount)
+        .cte("accepted")
+    )
 
-            receiver_balance = await session.execute(
-                select(Balance).where(Balance.user_id == receiver_id)
+    done_task = (
+        update(Task)
+        .where((Task.task_id == task_id) & exists(select(accepted.c.transaction_id)))
+        .values(status=TaskStatus.done)
+        .returning(Task.task_id)
+        .cte("done_task")
+    )
+
+    paid_chats = (
+        update(Chat)
+        .where(
+            and_(
+                Chat.task_id == task_id,
+                Chat.executor_id == accepted.c.receiver_id,
+                Chat.client_id == accepted.c.sender_id
             )
+        )
+        .values(is_payed=True, payment_date=datetime.utcnow())
+        .returning(Chat.id)
+        .cte("paid_chats")
+    )
+
+    credit = (
+        credit_balance_stmt(receiver_id, select(accepted.c.amount).scalar_subquery())
+        .where(exists(select(accepted.c.transaction_id)))
+        .cte("credit")
+    )
 
-            receiver_balance: Balance = receiver_balance.scalars().first()
-            receiver_balance.balance_money += transaction.amount
+    # Joined with the credit so nothing is booked when the receiver has no balance account
+    paid = accepted.join(credit, true())
+    movement_id = new_movement_id()
+    entries = ledger_entries_cte(
+        "payout_entries",
+        ledger_leg(movement_id, LedgerAccount.escrow, None, -accepted.c.amount,
+                   LedgerReason.payout, accepted.c.invoice_id).select_from(paid),
+        ledger_leg(movement_id, LedgerAccount.user, receiver_id, accepted.c.amount,
+                   LedgerReason.payout, accepted.c.invoice_id).select_from(paid)
+    )
 
+    res = await session.execute(
+        select(
+            accepted.c.transaction_id,
+            credit.c.balance_money.label("new_balance"),
+            select(func.count()).select_from(paid_chats).scalar_subquery().label("chats_paid")
+        )
+        .select_from(outerjoin(accepted, credit, true()))
+        .add_cte(done_task)
+        .add_cte(entries)
+    )
+    row = res.first()
+
+    if row is None:
+        raise InvalidRequestError(f"Transaction {transaction_id} is not pending")
+    if row.new_balance is None:
+        raise InvalidRequestError(f"Balance account of user {receiver_id} does not exist")
+    return row
+
+
+async def accept_done_offer(
+        transaction_id,
+        task_id,
+        receiver_id,
+):
+    try:
+        async with async_session() as session:
+            row = await execute_accept_offer(session, transaction_id, task_id, receiver_id)
             await session.commit()
 
+        forget_balance(receiver_id)
+        return row
+
     except IntegrityError as err:
         await session.rollback()
         raise
 
 
-async def create_money_transfer(
+async def execute_money_transfer(
+        session: AsyncSession,
         receiver_id: int,
         sender_id: int,
         task_id: int,
-        amount: decimal.Decimal
-):
-    try:
-        async with async_session() as session:
+        amount: int
+) -> Row:
+    """
+    Pay for a task from the sender's balance in one statement, inside the caller's transaction.
 
-            sender_balance = await session.execute(
-                select(Balance).where(Balance.user_id == sender_id)
-            )
+    A single data-modifying CTE debits the sender only if the balance covers the amount, and only
+    when the debit went through inserts the pending transfer, assigns the task to the receiver and
+    writes the ledger entries. The debit takes the row lock of the sender's balance first, so
+    concurrent transfers from the same sender queue on it and can never overdraw it.
 
-            sender_balance = sender_balance.scalars().first()
+    Returns the created transaction row; raises InvalidRequestError if the sender has no balance
+    account and InsufficientFundsError if the balance does not cover the amount.
+    """
+    # Whole kopecks, so the two legs always add up to the amount
+    commission = commission_of(amount)
+    amount_after_commission = amount - commission
 
-            if sender_balance.balance_money < amount:
-                raise ValueError("Incorrect transaction amount")
+    debit = debit_balance_stmt(sender_id, amount).cte("debit")
 
-            commission = amount * COMMISSION
+    transfer = (
+        insert(Transaction)
+        .from_select(
+            ["task_id", "invoice_id", "transaction_type", "receiver_id", "sender_id", "transaction_status",
+             "commission", "amount", "transaction_date"],
+            select(
+                literal(task_id),
+                literal(str(uuid1())),
+                literal(TransactionType.transfer, Transaction.transaction_type.type),
+                literal(receiver_id, BIGINT),
+                literal(sender_id, BIGINT),
+                literal(TransactionStatus.pending, Transaction.transaction_status.type),
+                literal(commission, Transaction.commission.type),
+                literal(amount_after_commission, Transaction.amount.type),
+                literal(datetime.utcnow())
+            ).select_from(debit)
+        )
+        .returning(*Transaction.__table__.c)
+        .cte("transfer")
+    )
 
-            amount_after_commission = amount - commission
-            sender_balance.balance_money -= amount
+    assigned_task = (
+        update(Task)
+        .where((Task.task_id == task_id) & exists(select(transfer.c.transaction_id)))
+        .values(executor_id=receiver_id, status=TaskStatus.executing)
+        .returning(Task.task_id)
+        .cte("assigned_task")
+    )
 
-            transaction = Transaction(
-                task_id=task_id,
-                invoice_id=str(uuid1()),
-                transaction_type=TransactionType.transfer,
-                receiver_id=receiver_id,
-                sender_id=sender_id,
-                transaction_status=TransactionStatus.pending,
-                commission=commission,
-                amount=amount_after_commission
-            )
+    movement_id = new_movement_id()
+    entries = ledger_entries_cte(
+        "transfer_entries",
+        ledger_leg(movement_id, LedgerAccount.user, sender_id, -(transfer.c.amount + transfer.c.commission),
+                   LedgerReason.transfer, transfer.c.invoice_id).select_from(transfer),
+        ledger_leg(movement_id, LedgerAccount.escrow, None, transfer.c.amount,
+                   LedgerReason.transfer, transfer.c.invoice_id).select_from(transfer),
+        ledger_leg(movement_id, LedgerAccount.commission, None, transfer.c.commission,
+                   LedgerReason.transfer, transfer.c.invoice_id).select_from(transfer)
+    )
 
-            session.add(transaction)
+    res = await session.execute(
+        select(Balance.balance_money, debit.c.balance_money.label("new_balance"), transfer)
+        .select_from(outerjoin(outerjoin(Balance, debit, true()), transfer, true()))
+        .where(Balance.user_id == sender_id)
+        .add_cte(assigned_task)
+        .add_cte(entries)
+    )
+    row = res.first()
+
+    if row is None:
+        raise InvalidRequestError(f"Balance account of user {sender_id} does not exist")
+    if row.new_balance is None:
+        raise InsufficientFundsError(f"Balance {row.balance_money} is less than {amount}")
+    return row
 
-            await session.execute(
-                update(Task).where(Task.task_id == task_id).values(
-                    executor_id=receiver_id,
-                    status=TaskStatus.executing
-                )
-            )
 
+async def create_money_transfer(
+        receiver_id: int,
+        sender_id: int,
+        task_id: int,
+        amount: int
+):
+    try:
+        async with async_session() as session:
+            row = await execute_money_transfer(session, receiver_id, sender_id, task_id, amount)
             await session.commit()
-            return transaction
+
+        forget_balance(sender_id)
+        notify_payment(task_id, receiver_id, sender_id)
+        return row
     except IntegrityError as err:
         print(err)
         await session.rollback()
         raise
+
+
+class BatchMode(enum.StrEnum):
+    atomic: str = "atomic"
+    partial: str = "partial"
+
+
+# Outcome of one batch item: the returned row, or the error, or neither when it was rolled back with the batch
+BatchItemOutcome = Tuple[Optional[Row], Optional[Exception]]
+
+# Failures of a single item; anything else aborts the whole batch
+BATCH_ITEM_ERRORS = (InvalidRequestError, InsufficientFundsError, DBAPIError)
+
+
+async def _run_batch(
+        operations: List[Callable[[AsyncSession], Awaitable[Row]]],
+        order: List[int],
+        mode: BatchMode
+) -> Tuple[bool, List[BatchItemOutcome]]:
+    """
+    Run payment operations in one transaction, in the given order of their indexes.
+
+    In atomic mode the first failure rolls back the whole batch. In partial mode every operation runs
+    in its own savepoint and a failure only undoes that one. Returns whether anything was committed
+    and the outcome of every operation in its original position.
+    """
+    outcomes: List[BatchItemOutcome] = [(None, None)] * len(operations)
+
+    async with async_session() as session:
+        try:
+            async with session.begin():
+                for index in order:
+                    try:
+                        if mode == BatchMode.partial:
+                            async with session.begin_nested():
+                                row = await operations[index](session)
+                        else:
+                            row = await operations[index](session)
+                    except BATCH_ITEM_ERRORS as err:
+                        outcomes[index] = (None, err)
+                        if mode == BatchMode.atomic:
+                            raise
+                        continue
+
+                    outcomes[index] = (row, None)
+
+        except BATCH_ITEM_ERRORS:
+            # Everything that had succeeded went away with the rollback
+            return False, [(None, err) for _, err in outcomes]
+
+    return True, outcomes
+
+
+async def create_money_transfers(
+        transfers: List[dict],
+        mode: BatchMode = BatchMode.atomic
+) -> Tuple[bool, List[BatchItemOutcome]]:
+    """
+    Run several transfers (create_money_transfer arguments) with one commit.
+
+    They are applied in sender order, so concurrent batches lock balance rows in the same order and
+    cannot deadlock each other.
+    """
+    order = sorted(range(len(transfers)), key=lambda i: (transfers[i]["sender_id"], transfers[i]["task_id"]))
+    committed, outcomes = await _run_batch(
+        [partial(execute_money_transfer, **transfer) for transfer in transfers], order, mode
+    )
+
+    if committed:
+        for index in order:
+            row, _ = outcomes[index]
+            if row is not None:
+                transfer = transfers[index]
+                forget_balance(transfer["sender_id"])
+                notify_payment(transfer["task_id"], transfer["receiver_id"], transfer["sender_id"])
+
+    return committed, outcomes
+
+
+async def accept_done_offers(
+        offers: List[dict],
+        mode: BatchMode = BatchMode.atomic
+) -> Tuple[bool, List[BatchItemOutcome]]:
+    """
+    Accept several done offers (accept_done_offer arguments) with one commit, in receiver order.
+    """
+    order = sorted(range(len(offers)), key=lambda i: (offers[i]["receiver_id"], offers[i]["transaction_id"]))
+    committed, outcomes = await _run_batch(
+        [partial(execute_accept_offer, **offer) for offer in offers], order, mode
+    )
+
+    if committed:
+        for index in order:
+            row, _ = outcomes[index]
+            if row is not None:
+                forget_balance(offers[index]["receiver_id"])
+
+    return committed, outcomes
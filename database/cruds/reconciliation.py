@@ -0,0 +1,86 @@
+import os
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from sqlalchemy import select, union_all, func, Select
+
+from database.database import async_session
+from database.models import Balance, Transaction, TransactionType, TransactionStatus, WithdrawalRequest, \
+    WithdrawalStatus
+from utils.money import from_minor
+
+load_dotenv()
+
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", 5000))
+
+
+def expected_balances_stmt() -> Select:
+    """
+    Every balance next to the balance its history adds up to:
+    completed deposits and transfers received, minus transfers sent (amount and commission are
+    charged when the transfer is created) and withdrawal requests that were not rejected.
+
+    Aggregation runs in Postgres; the result is one row per balance ordered by user_id.
+    """
+    movements = union_all(
+        select(Transaction.receiver_id.label("user_id"), Transaction.amount.label("delta")).where(
+            (Transaction.receiver_id.isnot(None)) &
+            (Transaction.transaction_type.in_([TransactionType.debit, TransactionType.transfer])) &
+            (Transaction.transaction_status == TransactionStatus.completed)
+        ),
+        select(Transaction.sender_id, -(Transaction.amount + func.coalesce(Transaction.commission, 0))).where(
+            (Transaction.sender_id.isnot(None)) &
+            (Transaction.transaction_type == TransactionType.transfer) &
+            (Transaction.transaction_status != TransactionStatus.failed)
+        ),
+        select(WithdrawalRequest.user_id, -WithdrawalRequest.amount).where(
+            WithdrawalRequest.status != WithdrawalStatus.rejected
+        )
+    ).subquery("movements")
+
+    totals = (
+        select(movements.c.user_id, func.sum(movements.c.delta).label("total"))
+        .group_by(movements.c.user_id)
+        .subquery("totals")
+    )
+
+    return (
+        select(
+            Balance.user_id,
+            Balance.balance_money,
+            func.coalesce(totals.c.total, 0).label("expected_balance")
+        )
+        .outerjoin(totals, totals.c.user_id == Balance.user_id)
+        .order_by(Balance.user_id)
+    )
+
+
+async def reconcile_balances(batch_size: int = RECONCILE_BATCH_SIZE) -> AsyncIterator[dict]:
+    """
+    Stream the balances that do not match their history, followed by one summary record.
+
+    Rows come through a server-side cursor `batch_size` at a time, so memory stays bounded no matter
+    how many users and transactions there are.
+    """
+    checked = mismatched = 0
+    total_difference = 0
+
+    async with async_session() as session:
+        result = await session.stream(expected_balances_stmt().execution_options(yield_per=batch_size))
+
+        async for rows in result.partitions():
+            for user_id, balance_money, expected_balance in rows:
+                checked += 1
+                difference = balance_money - expected_balance
+
+                if difference:
+                    mismatched += 1
+                    total_difference += difference
+                    yield {
+                        "user_id": user_id,
+                        "balance_money": from_minor(balance_money),
+                        "expected_balance": from_minor(expected_balance),
+                        "difference": from_minor(difference)
+                    }
+
+    yield {"summary": {"checked": checked, "mismatched": mismatched, "total_difference": from_minor(total_difference)}}
@@ -5,7 +5,7 @@ from typing import List, Tuple
 from sqlalchemy import select, func, desc
 from sqlalchemy.exc import DBAPIError, IntegrityError
 
-from database.database import async_session
+from database.database import async_session, read_only
 from database.models import Review, User
 
 
@@ -40,6 +40,7 @@ async def save_review_data(
         await session.rollback()
 
 
+@read_only
 async def get_user_reviews_data(
         user_id: int
 ) -> Tuple[List[Tuple], List[Tuple], decimal.Decimal, List[Tuple]]:
@@ -1,13 +1,16 @@
 import datetime
 import enum
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
-from sqlalchemy import update, select, asc
+from sqlalchemy import update, select, asc, bindparam
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
-from database.database import async_session
+from database.database import async_session, read_only
 from database.models import TaskStatus, FileType, PropositionBy, Task, User
 
+# Hot lookup of get_task, built once (see USER_BY_TELEGRAM_ID in database.cruds.users)
+TASK_BY_ID = select(Task).where(Task.task_id == bindparam("task_id"))
+
 
 class UserType(enum.StrEnum):
     client: str = "client"
@@ -17,7 +20,7 @@ class UserType(enum.StrEnum):
 async def save_task_to_db(
         client_id: int,
         status: TaskStatus,
-        price: str,
+        price: int,
         subjects: List[str],
         work_type: List[str],
         deadline: datetime.date,
@@ -77,33 +80,47 @@ async def update_task_status(
     return False
 
 
+@read_only
 async def get_all_tasks(
         user_id: int,
         user_type: UserType,
         *status: TaskStatus,
-        task_id: Optional[int] = None
+        task_id: Optional[int] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        columns: Optional[Sequence] = None
 ):
+    """
+    Tasks of a client or an executor in any of the given statuses, optionally narrowed to one task or to
+    a price range in kopecks (both bounds inclusive). Returns Task objects, or rows of just `columns`
+    (Task attributes) when given.
+    """
     try:
         async with async_session() as session:
             if user_type == UserType.client:
-                default_stmt = select(Task).where(
+                default_stmt = select(*columns or [Task]).where(
                     (Task.client_id == user_id) & (Task.status.in_(status))
                 )
 
             if user_type == UserType.executor:
-                default_stmt = select(Task).where(
+                default_stmt = select(*columns or [Task]).where(
                     (Task.executor_id == user_id) & (Task.status.in_(status))
                 )
 
             if task_id:
-                default_stmt.where(
+                default_stmt = default_stmt.where(
                     Task.task_id == task_id
                 )
 
+            if min_price is not None:
+                default_stmt = default_stmt.where(Task.price >= min_price)
+
+            if max_price is not None:
+                default_stmt = default_stmt.where(Task.price <= max_price)
+
             orders = await session.execute(default_stmt.order_by(asc(Task.task_id)))
 
-            orders = orders.scalars().all()
-            return orders
+            return orders.all() if columns else orders.scalars().all()
     except IntegrityError:
         print("Error with database acquired!")
         raise
@@ -162,9 +179,7 @@ async def get_proposed_deals(
 async def get_task(task_id: int):
     try:
         async with async_session() as session:
-            task = await session.execute(
-                select(Task).where(Task.task_id == task_id)
-            )
+            task = await session.execute(TASK_BY_ID, {"task_id": task_id})
             task = task.scalars().first()
             return task
     except NoResultFound:
@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
 
-from database.database import async_session
+from database.database import async_session, read_only
 from database.models import UserTicket, TicketStatus
 
 
@@ -29,6 +29,7 @@ async def create_user_ticket(
         raise
 
 
+@read_only
 async def get_user_tickets(
         status: TicketStatus = TicketStatus.open
 ):
@@ -1,23 +1,32 @@
-import decimal
 from sqlite3 import IntegrityError
-from typing import Optional
+from datetime import datetime
+from typing import Optional, List, Tuple
 
-from sqlalchemy import update, select, or_, and_
-from database.cruds.balance import update_balance, BalanceAction
+from sqlalchemy import update, select, and_, exists, values, column, func, union_all, tuple_, text, true, String, BIGINT
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import aliased
 
-from database.database import async_session
+from database.cruds.balance import credit_balance_stmt, forget_balance
+from database.cruds.ledger import deposit_entries_cte
+from database.database import async_session, read_only
 from database.models import TransactionType, TransactionStatus, Transaction
 
+TRANSACTIONS_PAGE_SIZE = 50
+
+# Columns filled by bulk ingestion; transaction_id comes from the sequence
+INGEST_COLUMNS = ["invoice_id", "sender_id", "receiver_id", "task_id", "amount", "commission", "transaction_type",
+                  "transaction_status", "transaction_date"]
+
 
 async def add_transaction_data(
         invoice_id: str,
-        amount: decimal.Decimal,
+        amount: int,
         transaction_type: TransactionType,
         transaction_status: TransactionStatus,
         sender_id: Optional[int] = None,
         receiver_id: Optional[int] = None,
         task_id: Optional[int] = None,
-        commission: Optional[decimal.Decimal] = None
+        commission: Optional[int] = None
 ):
     try:
         async with async_session() as session:
@@ -43,6 +52,44 @@ async def add_transaction_data(
         raise
 
 
+async def copy_transactions(rows: List[Tuple]) -> int:
+    """
+    Bulk insert of transactions through COPY, all or nothing.
+
+    Rows (in INGEST_COLUMNS order, enums by member name, amounts in kopecks) are copied into a temporary
+    staging table and moved into transactions with one INSERT ... SELECT that skips invoices already
+    stored, so a load can be re-run after a partial failure. The partitions of the rows' months must
+    exist.
+
+    Returns the number of rows inserted.
+    """
+    columns = ", ".join(INGEST_COLUMNS)
+
+    async with async_session() as session:
+        await session.execute(
+            text(f"CREATE TEMP TABLE ingest_staging ON COMMIT DROP AS SELECT {columns} FROM transactions WITH NO DATA")
+        )
+
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            "ingest_staging", records=rows, columns=INGEST_COLUMNS
+        )
+
+        res = await session.execute(
+            text(f"""
+                INSERT INTO transactions ({columns})
+                SELECT DISTINCT ON (staged.invoice_id) {", ".join(f"staged.{column}" for column in INGEST_COLUMNS)}
+                FROM ingest_staging staged
+                WHERE NOT EXISTS (SELECT 1 FROM transactions stored WHERE stored.invoice_id = staged.invoice_id)
+            """)
+        )
+
+        await session.commit()
+
+    return res.rowcount
+
+
 async def update_transaction_status(
         invoice_id: str,
         new_status: TransactionStatus
@@ -60,28 +107,85 @@ async def update_transaction_status(
         raise
 
 
+@read_only
 async def get_user_transactions(
-        user_id: int
-):
-    try:
-        async with async_session() as session:
-            res = await session.execute(
-                select(Transaction).where(or_(Transaction.receiver_id == user_id, Transaction.sender_id == user_id))
-            )
+        user_id: int,
+        limit: int = TRANSACTIONS_PAGE_SIZE,
+        after: Optional[Tuple[datetime, int]] = None,
+        transaction_type: Optional[TransactionType] = None,
+        transaction_status: Optional[TransactionStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+) -> Tuple[List[Transaction], Optional[Tuple[datetime, int]]]:
+    """
+    One page of the transactions a user sent or received, newest first.
 
-            return res.scalars().all()
+    Keyset pagination on (transaction_date, transaction_id): each side of the history is read as a
+    separate branch walking its own (sender_id / receiver_id, transaction_date, transaction_id) index
+    backwards from the cursor and stopping after a page, so a page costs the same however long the
+    history is.
 
-    except IntegrityError:
-        print("Error")
-        return []
+    Parameters:
+    - after: (transaction_date, transaction_id) of the last row of the previous page.
+    - date_from, date_to: Optional bounds on transaction_date, inclusive and exclusive.
+
+    Returns:
+    The page and the key of its last row if there are more rows after it, else None.
+    """
+    conditions = []
+    if transaction_type is not None:
+        conditions.append(Transaction.transaction_type == transaction_type)
+    if transaction_status is not None:
+        conditions.append(Transaction.transaction_status == transaction_status)
+    if date_from is not None:
+        conditions.append(Transaction.transaction_date >= date_from)
+    if date_to is not None:
+        conditions.append(Transaction.transaction_date < date_to)
+    if after is not None:
+        conditions.append(tuple_(Transaction.transaction_date, Transaction.transaction_id) < tuple_(*after))
+        # Redundant with the row comparison, but lets Postgres skip the partitions newer than the cursor
+        conditions.append(Transaction.transaction_date <= after[0])
+
+    newest_first = (Transaction.transaction_date.desc(), Transaction.transaction_id.desc())
+
+    sent = (
+        select(Transaction)
+        .where(Transaction.sender_id == user_id, *conditions)
+        .order_by(*newest_first)
+        .limit(limit + 1)
+    )
+    # Transfers to oneself are already in the sent branch
+    received = (
+        select(Transaction)
+        .where(Transaction.receiver_id == user_id, Transaction.sender_id.is_distinct_from(user_id), *conditions)
+        .order_by(*newest_first)
+        .limit(limit + 1)
+    )
+
+    history = aliased(Transaction, union_all(sent, received).subquery("history"))
+
+    async with async_session() as session:
+        res = await session.execute(
+            select(history).order_by(history.transaction_date.desc(), history.transaction_id.desc()).limit(limit + 1)
+        )
+        transactions = res.scalars().all()
 
+    if len(transactions) <= limit:
+        return transactions, None
 
+    last = transactions[limit - 1]
+    return transactions[:limit], (last.transaction_date, last.transaction_id)
+
+
+@read_only
 async def get_transaction_data(
         sender_id: int,
         receiver_id: int,
         task_id: Optional[int] = None,
         transaction_type: Optional[TransactionType] = None,
-        transaction_status: Optional[TransactionStatus] = None
+        transaction_status: Optional[TransactionStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
 ):
     async with async_session() as session:
 
@@ -90,6 +194,12 @@ async def get_transaction_data(
             (Transaction.receiver_id == receiver_id),
         ]
 
+        # Bounds on the partition key keep the scan to the partitions of those months
+        if date_from is not None:
+            conditions.append(Transaction.transaction_date >= date_from)
+        if date_to is not None:
+            conditions.append(Transaction.transaction_date < date_to)
+
         if task_id is not None:
             conditions.append(Transaction.task_id == task_id)
         if transaction_type is not None:
@@ -108,23 +218,94 @@ async def get_transaction_data(
         return res.scalars().all()
 
 
-async def save_monobank_transaction_data(transaction_status, payload, user_id: int):
-    if transaction_status == 'success':
-        await update_transaction_status(
-            invoice_id=payload.get('invoiceId'),
-            new_status=TransactionStatus.completed
+async def apply_monobank_credits(
+        user_id: int,
+        credits: List[Tuple[str, int]]
+):
+    """
+    Complete a group of paid invoices of one user and credit their sum in a single statement.
+
+    Only invoices still pending are flipped to Completed, and the balance is credited with the sum
+    of exactly those, so redelivered or already applied invoices never credit twice. The matching
+    ledger entries are written by the same statement, only for invoices the credit went through.
+
+    Parameters:
+    - user_id: The owner of the balance.
+    - credits: (invoice_id, amount in kopecks) pairs taken from the callbacks.
+
+    Raises InvalidRequestError, with nothing committed, if invoices were completed but the user has no
+    balance account to credit.
+    """
+    incoming = values(
+        column("invoice_id", String),
+        column("amount", BIGINT),
+        name="incoming"
+    ).data(list(dict(credits).items()))
+
+    completed = (
+        update(Transaction)
+        .where(
+            (Transaction.invoice_id == incoming.c.invoice_id) &
+            (Transaction.transaction_status == TransactionStatus.pending)
         )
+        .values(transaction_status=TransactionStatus.completed)
+        .returning(Transaction.invoice_id, incoming.c.amount)
+        .cte("completed")
+    )
 
-        amount = decimal.Decimal(payload.get('amount')) / 100
+    credit = (
+        credit_balance_stmt(user_id, select(func.sum(completed.c.amount)).scalar_subquery())
+        .where(exists(select(completed.c.invoice_id)))
+        .cte("credit")
+    )
 
-        await update_balance(
-            user_id=user_id,
-            amount=amount,
-            action=BalanceAction.replenishment
+    # Joined with the credit so nothing is booked when the user has no balance account
+    credited = (
+        select(completed.c.invoice_id, completed.c.amount)
+        .select_from(completed.join(credit, true()))
+        .cte("credited")
+    )
+
+    async with async_session() as session:
+        res = await session.execute(
+            select(
+                select(func.count()).select_from(completed).scalar_subquery().label("completed"),
+                select(credit.c.balance_money).scalar_subquery().label("new_balance")
+            )
+            .add_cte(deposit_entries_cte(user_id, credited))
         )
+        row = res.first()
 
-    elif transaction_status == 'failure':
-        await update_transaction_status(
-            invoice_id=payload.get("invoiceId"),
-            new_status=TransactionStatus.failed
+        if row.completed and row.new_balance is None:
+            raise InvalidRequestError(f"Balance account of user {user_id} does not exist")
+
+        await session.commit()
+
+    forget_balance(user_id)
+
+
+async def fail_monobank_invoices(
+        invoice_ids: List[str]
+):
+    async with async_session() as session:
+        await session.execute(
+            update(Transaction)
+            .where(
+                (Transaction.invoice_id.in_(invoice_ids)) &
+                (Transaction.transaction_status == TransactionStatus.pending)
+            )
+            .values(transaction_status=TransactionStatus.failed)
         )
+
+        await session.commit()
+
+
+async def save_monobank_transaction_data(transaction_status, payload, user_id: int):
+    invoice_id = payload.get('invoiceId')
+
+    if transaction_status == 'success':
+        # Monobank reports amounts in kopecks already
+        await apply_monobank_credits(user_id=user_id, credits=[(invoice_id, int(payload.get('amount')))])
+
+    elif transaction_status == 'failure':
+        await fail_monobank_invoices([invoice_id])
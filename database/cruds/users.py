@@ -1,18 +1,27 @@
-from typing import List
+from typing import List, Dict, Optional, Sequence
 
-from sqlalchemy import select, update, or_, delete
+from sqlalchemy import select, update, or_, delete, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from sqlalchemy.exc import IntegrityError, DataError, InvalidRequestError
 from sqlalchemy.sql.expression import func
 
-from database.database import async_session
+from database.database import session_scope, read_only
 from database.models import User, UserStatus, Executor
 
+# Columns a user may change about themselves
+USER_UPDATABLE_FIELDS = {"email", "username", "phone"}
 
-async def get_user_auth(telegram_id: int) -> User:
+# Hot lookup built once with a bound parameter: its cache key is memoized, so each call goes straight to the
+# compiled SQL instead of rebuilding the statement
+USER_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam("telegram_id"))
+
+
+@read_only
+async def get_user_auth(telegram_id: int, session: Optional[AsyncSession] = None) -> User:
     try:
-        async with async_session() as session:
-            res = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        async with session_scope(session) as session:
+            res = await session.execute(USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id})
 
         return res.scalars().first()
     except IntegrityError as err:
@@ -20,17 +29,13 @@ async def get_user_auth(telegram_id: int) -> User:
 
 
 async def delete_user_from_db(
-        user_id: int
+        user_id: int,
+        session: Optional[AsyncSession] = None
 ):
-    try:
-        async with async_session() as session:
-            await session.execute(
-                delete(User).where(User.telegram_id == user_id)
-            )
-            await session.commit()
-    except IntegrityError:
-        await session.rollback()
-        raise
+    async with session_scope(session, commit=True) as session:
+        await session.execute(
+            delete(User).where(User.telegram_id == user_id)
+        )
 
 
 async def save_user_to_db(
@@ -41,9 +46,10 @@ async def save_user_to_db(
         chat_id: int,
         tg_username: str,
         email: str = "",
+        session: Optional[AsyncSession] = None
 ):
     try:
-        async with async_session() as session:
+        async with session_scope(session, commit=True) as session:
             user = User(
                 tg_id=telegram_id,
                 username=username,
@@ -55,71 +61,49 @@ async def save_user_to_db(
             )
 
             session.add(user)
-            await session.commit()
-            await session.close()
         return True
     except IntegrityError:
-        await session.rollback()
         print("IntegrityError: Violated a database constraint.")
     except DataError:
-        await session.rollback()
         print("DataError: Invalid data type or value.")
     except InvalidRequestError:
-        await session.rollback()
         print("InvalidRequestError: The session is in an invalid state.")
 
 
-async def _update_user_field(user_id: int, field_name: str, value: str) -> None:
+async def update_user_fields(user_id: int, fields: Dict[str, str], session: Optional[AsyncSession] = None) -> bool:
     """
-    Update a specific field for a user in the database.
+    Update several fields of a user with one UPDATE.
 
     Parameters:
     - user_id: The ID of the user.
-    - field_name: The name of the field to update.
-    - value: The new value for the field.
+    - fields: New values by column name, a subset of USER_UPDATABLE_FIELDS.
+    - session: The unit of work to run in; without one the update is committed right away.
 
     Returns:
-    None
+    False if there is no such user.
     """
-    try:
-        async with async_session() as session:
-            await session.execute(update(User).where((User.telegram_id == user_id)).values(**{field_name: value}))
-            await session.commit()
-
-    except IntegrityError:
-        await session.rollback()
-        print(f"IntegrityError: Violated a database constraint while updating {field_name}.")
-
-
-async def update_user_email(
-        user_id: int,
-        email: str
-):
-    await _update_user_field(user_id, "email", email)
-
+    unknown = set(fields) - USER_UPDATABLE_FIELDS
+    if unknown:
+        raise ValueError(f"Fields can not be updated: {', '.join(sorted(unknown))}")
+    if not fields:
+        return True
 
-async def update_user_nickname(
-        user_id: int,
-        nickname: str
-):
-    await _update_user_field(user_id, "username", nickname)
+    async with session_scope(session, commit=True) as session:
+        res = await session.execute(update(User).where(User.telegram_id == user_id).values(**fields))
 
-
-async def update_user_phone(
-        user_id: int,
-        phone: str
-):
-    await _update_user_field(user_id, "phone", phone)
+    return res.rowcount > 0
 
 
-async def get_default_users():
+@read_only
+async def get_default_users(columns: Optional[Sequence] = None, session: Optional[AsyncSession] = None):
+    """Users except superusers: as User objects, or as rows of just `columns` (User attributes) when given."""
     try:
-        async with async_session() as session:
+        async with session_scope(session) as session:
 
             result = await session.execute(
-                select(User).where(~User.user_status.in_([UserStatus.superuser]))
+                select(*columns or [User]).where(~User.user_status.in_([UserStatus.superuser]))
             )
-            return result.scalars().all()
+            return result.all() if columns else result.scalars().all()
 
     except IntegrityError:
         print("Error with results")
@@ -127,28 +111,26 @@ async def get_default_users():
 
 async def update_ban_status(
         user_id: int,
-        is_banned: bool
-):
-    try:
-        async with async_session() as session:
-            await session.execute(
-                update(User).where(User.telegram_id == user_id).values(is_banned=is_banned)
-            )
-
-            await session.commit()
+        is_banned: bool,
+        session: Optional[AsyncSession] = None
+) -> bool:
+    """Set the ban flag of a user. Returns False if there is no such user."""
+    async with session_scope(session, commit=True) as session:
+        res = await session.execute(
+            update(User).where(User.telegram_id == user_id).values(is_banned=is_banned)
+        )
 
-    except IntegrityError as err:
-        print(err)
-        await session.rollback()
+    return res.rowcount > 0
 
 
+@read_only
 async def get_similarity_users(
         name: str,
-        is_executor: bool = False
-
+        is_executor: bool = False,
+        session: Optional[AsyncSession] = None
 ) -> List[User]:
     try:
-        async with async_session() as session:
+        async with session_scope(session) as session:
             default_stmt = (select(User)
                             .where(or_((func.word_similarity(User.username, name) > 0.25),
                                        func.word_similarity(User.telegram_username, name) > 0.25))
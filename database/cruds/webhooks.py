@@ -0,0 +1,111 @@
+import os
+from datetime import timedelta
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy import select, asc, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import async_session
+from database.models import WebhookInbox, InboxStatus
+from utils.lru_cache import LRUCache
+
+load_dotenv()
+
+WEBHOOK_DEDUPE_SIZE = int(os.getenv("WEBHOOK_DEDUPE_SIZE", 10000))
+
+# Delivery keys this process has already stored, checked before touching the database
+recent_deliveries = LRUCache(maxsize=WEBHOOK_DEDUPE_SIZE)
+
+
+def webhook_delivery_key(payload: dict):
+    return payload.get("invoiceId"), payload.get("status"), payload.get("modifiedDate", "")
+
+
+async def save_webhook_to_inbox(
+        user_id: int,
+        payload: dict
+) -> bool:
+    """
+    Store a Monobank callback in the inbox.
+
+    Redeliveries of an already stored (invoiceId, status, modifiedDate) are dropped, first by the
+    in-memory LRU of recent keys and then by the uq_webhook_inbox_delivery constraint.
+    Returns True when a new row was inserted.
+    """
+    delivery_key = webhook_delivery_key(payload)
+
+    if delivery_key in recent_deliveries:
+        return False
+
+    invoice_id, invoice_status, modified_date = delivery_key
+
+    try:
+        async with async_session() as session:
+            res = await session.execute(
+                insert(WebhookInbox).values(
+                    user_id=user_id,
+                    payload=payload,
+                    invoice_id=invoice_id,
+                    invoice_status=invoice_status,
+                    modified_date=modified_date
+                ).on_conflict_do_nothing(
+                    constraint="uq_webhook_inbox_delivery"
+                ).returning(WebhookInbox.inbox_id)
+            )
+            inserted = res.scalar() is not None
+
+            await session.commit()
+    except IntegrityError as err:
+        print(err)
+        raise
+
+    recent_deliveries.set(delivery_key, True)
+    return inserted
+
+
+async def claim_pending_webhooks(
+        session: AsyncSession,
+        batch_size: int
+) -> List[WebhookInbox]:
+    """
+    Lock a batch of pending inbox rows for the current transaction.
+
+    Rows already locked by another worker (in this or any other process) are skipped,
+    so concurrent workers never apply the same callback at the same time.
+    """
+    res = await session.execute(
+        select(WebhookInbox)
+        .where(
+            (WebhookInbox.status == InboxStatus.pending) & (WebhookInbox.available_at <= func.now())
+        )
+        .order_by(asc(WebhookInbox.available_at), asc(WebhookInbox.inbox_id))
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+    return res.scalars().all()
+
+
+def mark_webhook_processed(inbox_row: WebhookInbox):
+    inbox_row.status = InboxStatus.processed
+    inbox_row.processed_at = func.now()
+
+
+def mark_webhook_failed(
+        inbox_row: WebhookInbox,
+        error: str,
+        max_attempts: int,
+        retry_delay: float
+):
+    inbox_row.attempts += 1
+    inbox_row.last_error = error
+
+    if inbox_row.attempts >= max_attempts:
+        inbox_row.status = InboxStatus.failed
+        inbox_row.processed_at = func.now()
+        return
+
+    inbox_row.available_at = func.now() + timedelta(seconds=retry_delay * inbox_row.attempts)
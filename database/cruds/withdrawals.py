@@ -1,5 +1,5 @@
-import decimal
 from datetime import datetime
+from typing import Optional, Sequence
 
 from sqlalchemy import select, desc, update
 
@@ -11,8 +11,8 @@ from database.models import WithdrawalStatus, WithdrawalRequest
 
 async def create_withdrawal_request(
         user_id: int,
-        amount: decimal.Decimal,
-        commission: decimal.Decimal,
+        amount: int,
+        commission: int,
         status: WithdrawalStatus,
         payment_method: str
 ):
@@ -37,17 +37,19 @@ async def create_withdrawal_request(
 
 
 async def get_all_withdrawal_requests(
-        status: WithdrawalStatus = WithdrawalStatus.pending
+        status: WithdrawalStatus = WithdrawalStatus.pending,
+        columns: Optional[Sequence] = None
 ):
+    """Withdrawal requests in a status, newest first: as objects, or as rows of just `columns` when given."""
     try:
         async with async_session() as session:
             res = await session.execute(
-                select(WithdrawalRequest)
+                select(*columns or [WithdrawalRequest])
                 .where(WithdrawalRequest.status == status)
                 .order_by(desc(WithdrawalRequest.request_date))
             )
 
-            return res.scalars().all()
+            return res.all() if columns else res.scalars().all()
 
     except IntegrityError as err:
         print(err)
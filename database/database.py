@@ -1,13 +1,21 @@
-import decimal
+import asyncio
+import functools
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 load_dotenv()
 
-COMMISSION = decimal.Decimal("0.03")
-
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
@@ -16,8 +24,320 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 
 SQLALCHEMY_DATABASE_URL_LOCAL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL_LOCAL, echo=True)
+# Streaming replica serving the reads of @read_only CRUDs; without a host everything goes to the primary
+POSTGRES_REPLICA_HOST = os.getenv("POSTGRES_REPLICA_HOST")
+POSTGRES_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT", POSTGRES_PORT)
+
+SQLALCHEMY_DATABASE_URL_REPLICA = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_REPLICA_HOST}:{POSTGRES_REPLICA_PORT}/{POSTGRES_DB}"
+
+# Seconds the replica may be behind the primary before reads fall back to the primary
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+
+# Engine settings per deployment kind, picked by DB_PROFILE:
+#   dev   - small pool, SQL echo, connections opened on demand
+#   prod  - pool sized for the app and filled at startup, stale connections recycled and pinged, no echo
+#   bench - fixed pool without overflow so runs are comparable, no echo
+# Any setting can be overridden by its own variable (DB_POOL_SIZE, DB_ECHO, ...).
+ENGINE_PROFILES = {
+    "dev": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_cache_size": 100,
+        "echo": True,
+        "pool_warmup": 0,
+    },
+    "prod": {
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+        "echo": False,
+        "pool_warmup": 20,
+    },
+    "bench": {
+        "pool_size": 50,
+        "max_overflow": 0,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_cache_size": 500,
+        "echo": False,
+        "pool_warmup": 50,
+    },
+}
+
+DB_PROFILE = os.getenv("DB_PROFILE", "dev")
+if DB_PROFILE not in ENGINE_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {DB_PROFILE!r}, expected one of {', '.join(ENGINE_PROFILES)}")
+
+
+def engine_setting(name: str):
+    default = ENGINE_PROFILES[DB_PROFILE][name]
+    value = os.getenv(f"DB_{name.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    return int(value)
+
+
+ENGINE_SETTINGS = {name: engine_setting(name) for name in ENGINE_PROFILES[DB_PROFILE]}
+
+
+def create_profile_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=ENGINE_SETTINGS["echo"],
+        pool_size=ENGINE_SETTINGS["pool_size"],
+        max_overflow=ENGINE_SETTINGS["max_overflow"],
+        pool_timeout=ENGINE_SETTINGS["pool_timeout"],
+        pool_recycle=ENGINE_SETTINGS["pool_recycle"],
+        pool_pre_ping=ENGINE_SETTINGS["pool_pre_ping"],
+        connect_args={
+            # SQLAlchemy keeps its own cache of asyncpg prepared statements per connection; both are
+            # set to 0 behind pgbouncer in transaction mode
+            "prepared_statement_cache_size": ENGINE_SETTINGS["statement_cache_size"],
+            "statement_cache_size": ENGINE_SETTINGS["statement_cache_size"],
+        },
+    )
+
+
+engine = create_profile_engine(SQLALCHEMY_DATABASE_URL_LOCAL)
+replica_engine = create_profile_engine(SQLALCHEMY_DATABASE_URL_REPLICA) if POSTGRES_REPLICA_HOST else None
+
+
+class ReplicaStatus:
+    # Replica reads stay off until the replica monitor has seen it caught up
+    usable: bool = False
+    lag: Optional[float] = None
+
+
+replica_status = ReplicaStatus()
+
+
+class RequestWrites:
+    wrote: bool = False
+
+
+# Set inside a @read_only CRUD call
+reading_only: ContextVar[bool] = ContextVar("reading_only", default=False)
+# Per HTTP request, set by ReadYourWritesMiddleware; None outside requests
+request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+
+def replica_readable() -> bool:
+    writes = request_writes.get()
+    return replica_engine is not None and replica_status.usable and not (writes is not None and writes.wrote)
+
+
+def has_dml_cte(clause) -> bool:
+    """Whether a select wraps INSERT/UPDATE/DELETE CTEs, as the money transfers and balance changes do."""
+    return any(isinstance(element, UpdateBase) for element in visitors.iterate(clause))
+
+
+class RoutingSession(Session):
+    """
+    Picks the engine per statement: selects of @read_only CRUDs go to the replica while it is usable and
+    the current request has not written anything yet (so a request reads its own writes), everything
+    else goes to the primary.
+
+    Writes are DML statements, flushes and selects wrapping DML CTEs. The latter are only looked for
+    outside @read_only CRUDs while a replica could still serve the request, so replica reads never pay
+    for walking the statement.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        writes = request_writes.get()
+
+        if self._flushing or not getattr(clause, "is_select", True):
+            if writes is not None:
+                writes.wrote = True
+            return engine.sync_engine
+
+        if reading_only.get():
+            return replica_engine.sync_engine if replica_readable() else engine.sync_engine
+
+        if replica_engine is not None and writes is not None and not writes.wrote and clause is not None \
+                and has_dml_cte(clause):
+            writes.wrote = True
+
+        return engine.sync_engine
+
 
 async_session = async_sessionmaker(
-    bind=engine, class_=AsyncSession, expire_on_commit=False, future=True
+    class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False, future=True
 )
+
+
+def read_only(crud):
+    """
+    Marks a CRUD function that only reads, so its queries may be served by the replica. If the replica
+    turns out to be gone before the replica monitor noticed, the call is repeated on the primary.
+    """
+
+    @functools.wraps(crud)
+    async def wrapper(*args, **kwargs):
+        token = reading_only.set(True)
+        try:
+            if not replica_readable():
+                return await crud(*args, **kwargs)
+
+            try:
+                return await crud(*args, **kwargs)
+            except (OSError, DBAPIError) as err:
+                if isinstance(err, DBAPIError) and not err.connection_invalidated:
+                    raise
+
+                # Off the replica until the monitor sees it healthy again
+                replica_status.usable = False
+                print(f"Replica read failed, reading from the primary: {err!r}")
+
+            return await crud(*args, **kwargs)
+        finally:
+            reading_only.reset(token)
+
+    return wrapper
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware giving every HTTP request its own write tracking: once a request has written to the
+    primary, its later @read_only reads go to the primary too instead of a replica that may lag behind.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = request_writes.set(RequestWrites())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_writes.reset(token)
+
+
+async def check_replica() -> Optional[float]:
+    """
+    Measure how far the replica is behind the primary, in seconds, and update replica_status.
+
+    The replica counts as caught up once it has replayed the WAL position the primary had when the check
+    started; otherwise the lag is the age of the last transaction it replayed. A second standalone server
+    (not in recovery) reports no lag. Returns None, and disables replica reads, if the replica cannot be
+    reached.
+    """
+    if replica_engine is None:
+        return None
+
+    try:
+        async with engine.connect() as connection:
+            primary_lsn = (await connection.execute(text("SELECT pg_current_wal_lsn()"))).scalar()
+
+        async with replica_engine.connect() as connection:
+            lag = (await connection.execute(
+                text("""
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn)
+                            THEN 0
+                        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+                    END
+                """),
+                {"primary_lsn": primary_lsn}
+            )).scalar()
+    except Exception:
+        replica_status.usable, replica_status.lag = False, None
+        raise
+
+    replica_status.lag = float(lag) if lag is not None else None
+    replica_status.usable = replica_status.lag is not None and replica_status.lag <= REPLICA_MAX_LAG
+
+    return replica_status.lag
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI dependency: the unit of work of one request. CRUD calls given this session share one pooled
+    connection and one transaction; the endpoint commits it explicitly once all of them succeeded,
+    anything left uncommitted is rolled back when the request ends.
+    """
+    async with async_session() as session:
+        yield session
+
+
+@asynccontextmanager
+async def session_scope(
+        session: Optional[AsyncSession] = None,
+        commit: bool = False
+) -> AsyncIterator[AsyncSession]:
+    """
+    Session for one CRUD call. With the caller's session (a request's unit of work) the changes are only
+    flushed and committing is up to the caller; without one a new session is opened and, for CRUDs that
+    write (commit=True), committed when the block exits without an error. Reads just close it, without
+    a COMMIT round trip.
+    """
+    if session is not None:
+        yield session
+        await session.flush()
+        return
+
+    async with async_session() as own_session:
+        yield own_session
+        if commit:
+            await own_session.commit()
+
+
+async def warm_up_engine(connections: int = ENGINE_SETTINGS["pool_warmup"]) -> int:
+    """
+    Open up to `connections` pooled connections at once on the primary and on the replica, if there is
+    one, and return them to the pool, so the first requests after a deploy do not pay for connecting.
+    Raises if the primary cannot be reached; an unreachable replica only stays out of routing.
+
+    Returns the number of connections opened on the primary.
+    """
+    connections = min(connections, ENGINE_SETTINGS["pool_size"])
+    if connections <= 0:
+        return 0
+
+    if replica_engine is not None:
+        try:
+            await fill_pool(replica_engine, connections)
+        except Exception as err:
+            print(f"Replica pool warmup failed: {err}")
+
+    return await fill_pool(engine, connections)
+
+
+async def fill_pool(target_engine: AsyncEngine, connections: int) -> int:
+
+    # All connections are held until every one is open, otherwise they would reuse each other
+    opened = await asyncio.gather(
+        *(target_engine.connect().start() for _ in range(connections)), return_exceptions=True
+    )
+    ready = [connection for connection in opened if not isinstance(connection, BaseException)]
+
+    try:
+        for connection in ready:
+            await connection.execute(text("SELECT 1"))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in ready))
+
+    for connection in opened:
+        if isinstance(connection, BaseException):
+            raise connection
+
+    return len(ready)
+
+
+async def dispose_engine():
+    # Closes the pooled connections so Postgres does not keep backends of a stopped app around
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
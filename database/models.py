@@ -1,14 +1,13 @@
-import decimal
 from datetime import datetime
 from aiogram.enums import ChatType
 
 from typing import List, Optional
 
-from sqlalchemy import false, true, func
+from sqlalchemy import false, true, func, text
 from sqlalchemy.orm import validates, Mapped
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_method
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy import (
     Column,
     String,
@@ -18,10 +17,10 @@ from sqlalchemy import (
     Boolean,
     TIMESTAMP,
     DATE,
-    DECIMAL,
     ForeignKey,
     UniqueConstraint,
-    LargeBinary
+    LargeBinary,
+    Index
 )
 import enum
 
@@ -77,6 +76,27 @@ class WithdrawalStatus(enum.StrEnum):
     rejected: str = "rejected"
 
 
+class InboxStatus(enum.StrEnum):
+    pending: str = "pending"
+    processed: str = "processed"
+    failed: str = "failed"
+
+
+class LedgerAccount(enum.StrEnum):
+    user: str = "user"
+    escrow: str = "escrow"
+    commission: str = "commission"
+    external: str = "external"
+
+
+class LedgerReason(enum.StrEnum):
+    opening: str = "opening"
+    deposit: str = "deposit"
+    adjustment: str = "adjustment"
+    transfer: str = "transfer"
+    payout: str = "payout"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -172,7 +192,8 @@ class Task(Base):
     executor_id = Column(BIGINT, ForeignKey("executors.user_id"), nullable=True)
     client_id = Column(BIGINT, ForeignKey("users.telegram_id", ondelete="SET NULL"))
     status = Column(Enum(TaskStatus), nullable=False)
-    price = Column(String, nullable=False)
+    # Kopecks
+    price = Column(BIGINT, nullable=False)
     date_added = Column(TIMESTAMP, default=datetime.utcnow)
     deadline = Column(DATE)
     proposed_by = Column(Enum(PropositionBy), nullable=False, default=PropositionBy.public)
@@ -182,10 +203,15 @@ class Task(Base):
     subjects = Column(ARRAY(String), nullable=False)
     work_type = Column(ARRAY(String), nullable=False)
 
+    __table_args__ = (
+        # Price range filters within a status
+        Index("ix_tasks_status_price", "status", "price"),
+    )
+
     def __init__(self,
                  client_id: int,
                  status: TaskStatus,
-                 price: str,
+                 price: int,
                  deadline: datetime.date,
                  subjects: List[str],
                  work_type: List[str],
@@ -280,12 +306,87 @@ class GroupMessage(Base):
 class Balance(Base):
     __tablename__ = "balance"
     user_id = Column(BIGINT, ForeignKey("users.telegram_id", ondelete="CASCADE"), primary_key=True, unique=True)
-    user_cards = Column(ARRAY(LargeBinary), nullable=True)
-    balance_money = Column(DECIMAL(10, 2), nullable=False, default=0.00)
+    # Kopecks
+    balance_money = Column(BIGINT, nullable=False, default=0)
 
-    def __init__(self, user_id: int, user_cards: List = None, balance_money: float = 0.00):
+    def __init__(self, user_id: int, balance_money: int = 0, user_cards: List[str] = None):
         self.user_id = user_id
+        self.balance_money = balance_money
+        # Not a column: cards loaded from user_cards for the response
         self.user_cards = user_cards
+
+
+class UserCard(Base):
+    __tablename__ = "user_cards"
+
+    card_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BIGINT, ForeignKey("users.telegram_id", ondelete="CASCADE"), nullable=False)
+    fingerprint = Column(LargeBinary, nullable=False)
+    encrypted_card = Column(LargeBinary, nullable=False)
+    masked_card = Column(String, nullable=False)
+    date_added = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "fingerprint", name="uq_user_cards_fingerprint"),
+    )
+
+    def __init__(self, user_id: int, fingerprint: bytes, encrypted_card: bytes, masked_card: str):
+        self.user_id = user_id
+        self.fingerprint = fingerprint
+        self.encrypted_card = encrypted_card
+        self.masked_card = masked_card
+
+
+class LedgerEntry(Base):
+    """
+    One leg of a money movement. Entries are only ever inserted; the legs sharing a movement_id
+    always sum to zero, and the entries of a user account sum to its balance_money.
+    """
+    __tablename__ = "ledger_entries"
+
+    entry_id = Column(BIGINT, primary_key=True, autoincrement=True)
+    movement_id = Column(UUID(as_uuid=True), nullable=False)
+    account = Column(Enum(LedgerAccount), nullable=False)
+    user_id = Column(BIGINT, ForeignKey("users.telegram_id", ondelete="SET NULL"), nullable=True)
+    # Kopecks
+    amount = Column(BIGINT, nullable=False)
+    reason = Column(Enum(LedgerReason), nullable=False)
+    reference = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_ledger_entries_user", "user_id", "created_at", postgresql_where=text("account = 'user'")),
+        Index("ix_ledger_entries_movement", "movement_id"),
+    )
+
+    def __init__(self, movement_id, account: LedgerAccount, amount: int, reason: LedgerReason,
+                 user_id: Optional[int] = None, reference: Optional[str] = None):
+        self.movement_id = movement_id
+        self.account = account
+        self.amount = amount
+        self.reason = reason
+        self.user_id = user_id
+        self.reference = reference
+
+    def __repr__(self):
+        return f"<LedgerEntry {self.entry_id} {self.account} {self.amount}>"
+
+
+class BalanceSnapshot(Base):
+    __tablename__ = "balance_snapshots"
+
+    user_id = Column(BIGINT, ForeignKey("users.telegram_id", ondelete="CASCADE"), primary_key=True)
+    as_of = Column(TIMESTAMP, primary_key=True)
+    # Kopecks
+    balance_money = Column(BIGINT, nullable=False)
+
+    __table_args__ = (
+        Index("ix_balance_snapshots_as_of", "as_of"),
+    )
+
+    def __init__(self, user_id: int, as_of: datetime, balance_money: int):
+        self.user_id = user_id
+        self.as_of = as_of
         self.balance_money = balance_money
 
 
@@ -297,19 +398,35 @@ class Transaction(Base):
     sender_id = Column(BIGINT, ForeignKey('users.telegram_id', ondelete="SET NULL"), nullable=True)
     receiver_id = Column(BIGINT, ForeignKey('users.telegram_id', ondelete="SET NULL"), nullable=True)
     task_id = Column(Integer, ForeignKey('tasks.task_id'), nullable=True)
-    amount = Column(DECIMAL(10, 2))
-    commission = Column(DECIMAL(precision=10, scale=2), nullable=True, default=decimal.Decimal(0.00))
+    # Kopecks
+    amount = Column(BIGINT)
+    commission = Column(BIGINT, nullable=True, default=0)
     transaction_type = Column(Enum(TransactionType), nullable=False)
     transaction_status = Column(Enum(TransactionStatus), nullable=False)
-    transaction_date = Column(TIMESTAMP, default=datetime.utcnow)
+    # Partition key, so part of the primary key
+    transaction_date = Column(TIMESTAMP, primary_key=True, nullable=False, default=datetime.utcnow,
+                              server_default=text("timezone('utc', now())"))
+
+    __table_args__ = (
+        # Covers the payment check polled by the bot without touching the heap
+        Index("ix_transactions_payment_check", "task_id", "sender_id", "receiver_id",
+              postgresql_include=["transaction_status"]),
+        # Keyset pagination of a user's history, one index per side
+        Index("ix_transactions_sender_date", "sender_id", "transaction_date", "transaction_id"),
+        Index("ix_transactions_receiver_date", "receiver_id", "transaction_date", "transaction_id"),
+        # Status updates, webhook credits and bulk ingestion look transactions up by invoice
+        Index("ix_transactions_invoice_id", "invoice_id"),
+        # Monthly partitions named transactions_pYYYYMM, managed by database.cruds.partitions
+        {"postgresql_partition_by": "RANGE (transaction_date)"},
+    )
 
     def __init__(
             self,
             invoice_id: str,
-            amount: decimal.Decimal,
+            amount: int,
             transaction_type: TransactionType,
             transaction_status: TransactionStatus,
-            commission: Optional[decimal.Decimal] = None,
+            commission: Optional[int] = None,
             sender_id: Optional[int] = None,
             receiver_id: Optional[int] = None,
             task_id: Optional[int] = None
@@ -329,8 +446,9 @@ class WithdrawalRequest(Base):
 
     request_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BIGINT, ForeignKey('users.telegram_id', ondelete="CASCADE"), nullable=False)
-    amount = Column(DECIMAL(10, 2), nullable=False)
-    commission = Column(DECIMAL(10, 2), nullable=False)
+    # Kopecks
+    amount = Column(BIGINT, nullable=False)
+    commission = Column(BIGINT, nullable=False)
     request_date = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
     status = Column(Enum(WithdrawalStatus), default=WithdrawalStatus.pending, nullable=False)
     payment_method = Column(String, nullable=False)
@@ -342,8 +460,8 @@ class WithdrawalRequest(Base):
     def __init__(
             self,
             user_id: int,
-            amount: decimal.Decimal,
-            commission: decimal.Decimal,
+            amount: int,
+            commission: int,
             payment_method: str,
             status: WithdrawalStatus,
             payment_details: str = None,
@@ -363,6 +481,40 @@ class WithdrawalRequest(Base):
         return f"Номер заявки №{self.request_id}, сума - {self.amount}"
 
 
+class WebhookInbox(Base):
+    __tablename__ = "webhook_inbox"
+
+    inbox_id = Column(BIGINT, primary_key=True, autoincrement=True)
+    user_id = Column(BIGINT, nullable=False)
+    invoice_id = Column(String, nullable=True)
+    invoice_status = Column(String, nullable=True)
+    modified_date = Column(String, nullable=True)
+    payload = Column(JSONB, nullable=False)
+    status = Column(Enum(InboxStatus), nullable=False, default=InboxStatus.pending,
+                    server_default=InboxStatus.pending.name)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String, nullable=True)
+    received_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    available_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    processed_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_inbox_pending", "available_at", "inbox_id", postgresql_where=text("status = 'pending'")),
+        UniqueConstraint("invoice_id", "invoice_status", "modified_date", name="uq_webhook_inbox_delivery"),
+    )
+
+    def __init__(self, user_id: int, payload: dict, invoice_id: Optional[str] = None,
+                 invoice_status: Optional[str] = None, modified_date: Optional[str] = None):
+        self.user_id = user_id
+        self.payload = payload
+        self.invoice_id = invoice_id
+        self.invoice_status = invoice_status
+        self.modified_date = modified_date
+
+    def __repr__(self):
+        return f"<WebhookInbox {self.inbox_id} for invoice {self.invoice_id}>"
+
+
 class Warning(Base):
     __tablename__ = "warnings"
 
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import aiohttp
+
+from loadtest.fake_monobank import Callback
+
+
+@dataclass
+class DriverResult:
+    ack_latencies: List[float] = field(default_factory=list)
+    status_codes: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+    # invoice_id -> monotonic time the first final-status callback was sent
+    final_sent_at: Dict[str, float] = field(default_factory=dict)
+    duration: float = 0.0
+
+
+async def fire_callbacks(
+        app_url: str,
+        callbacks: List[Callback],
+        rate: float,
+        concurrency: int
+) -> DriverResult:
+    """Send callbacks to the app's webhook endpoint at `rate` requests per second."""
+    result = DriverResult()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def send(client: aiohttp.ClientSession, callback: Callback):
+        if callback.status in ("success", "failure"):
+            result.final_sent_at.setdefault(callback.invoice_id, time.monotonic())
+
+        started = time.monotonic()
+        try:
+            async with client.post(
+                    f"{app_url}/webhook/monobank/{callback.user_id}",
+                    data=callback.body,
+                    headers={"X-Sign": callback.x_sign, "Content-Type": "application/json"}
+            ) as resp:
+                await resp.read()
+                result.status_codes[resp.status] = result.status_codes.get(resp.status, 0) + 1
+        except aiohttp.ClientError:
+            result.errors += 1
+            return
+
+        result.ack_latencies.append(time.monotonic() - started)
+
+    async with aiohttp.ClientSession(connector=connector) as client:
+        started = time.monotonic()
+        requests = []
+
+        for number, callback in enumerate(callbacks):
+            delay = started + number / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            requests.append(asyncio.create_task(send(client, callback)))
+
+        await asyncio.gather(*requests)
+        result.duration = time.monotonic() - started
+
+    return result
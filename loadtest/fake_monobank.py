@@ -0,0 +1,171 @@
+import base64
+import json
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+import asyncpg
+from aiohttp import web
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+@dataclass
+class Invoice:
+    invoice_id: str
+    user_id: int
+    amount: int
+    final_status: str
+
+
+@dataclass
+class Callback:
+    invoice_id: str
+    user_id: int
+    status: str
+    body: bytes
+    x_sign: str
+
+
+class FakeMonobank:
+    """
+    Local stand-in for Monobank: owns the merchant key, serves it like /api/merchant/pubkey does
+    and produces signed invoice callbacks.
+
+    The key is kept in `key_file`, so an app that already cached it keeps working between runs.
+    """
+
+    def __init__(self, key_file: str):
+        if os.path.exists(key_file):
+            with open(key_file, "rb") as file:
+                self.private_key = serialization.load_pem_private_key(file.read(), password=None)
+        else:
+            self.private_key = ec.generate_private_key(ec.SECP256R1())
+            with open(key_file, "wb") as file:
+                file.write(self.private_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption()
+                ))
+
+    def public_key_b64(self) -> str:
+        pem = self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return base64.b64encode(pem).decode()
+
+    def web_app(self) -> web.Application:
+        async def pubkey(request: web.Request):
+            return web.json_response({"key": self.public_key_b64()})
+
+        app = web.Application()
+        app.router.add_get("/api/merchant/pubkey", pubkey)
+        return app
+
+    def sign(self, body: bytes) -> str:
+        return base64.b64encode(self.private_key.sign(body, ec.ECDSA(hashes.SHA256()))).decode()
+
+    def make_callback(self, invoice: Invoice, status: str, modified_date: datetime) -> Callback:
+        payload = {
+            "invoiceId": invoice.invoice_id,
+            "status": status,
+            "amount": invoice.amount,
+            "ccy": 980,
+            "createdDate": modified_date.replace(microsecond=0).isoformat() + "Z",
+            "modifiedDate": modified_date.isoformat() + "Z"
+        }
+        if status == "failure":
+            payload["failureReason"] = "Load test decline"
+
+        body = json.dumps(payload).encode()
+        return Callback(invoice.invoice_id, invoice.user_id, status, body, self.sign(body))
+
+    def generate_callbacks(
+            self,
+            invoices: List[Invoice],
+            duplicate_rate: float,
+            out_of_order_rate: float
+    ) -> List[Callback]:
+        """
+        Every invoice gets a "processing" callback followed by its final status. With the given
+        probabilities the final callback is redelivered and the "processing" one arrives late.
+        """
+        callbacks = []
+        now = datetime.utcnow()
+
+        for invoice in invoices:
+            processing = self.make_callback(invoice, "processing", now)
+            final = self.make_callback(invoice, invoice.final_status, now + timedelta(seconds=1))
+
+            sequence = [final, processing] if random.random() < out_of_order_rate else [processing, final]
+            if random.random() < duplicate_rate:
+                sequence.append(final)
+
+            callbacks.append(sequence)
+
+        # Interleave invoices the way concurrent payments arrive, keeping each invoice's own order
+        ordered = []
+        while callbacks:
+            sequence = random.choice(callbacks)
+            ordered.append(sequence.pop(0))
+            if not sequence:
+                callbacks.remove(sequence)
+
+        return ordered
+
+
+async def seed_invoices(
+        dsn: str,
+        users: int,
+        invoices: int,
+        failure_rate: float,
+        first_user_id: int = 9_000_000_000
+) -> List[Invoice]:
+    """Create load-test users with balances and pending Debit transactions for fresh invoices."""
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = [first_user_id + number for number in range(users)]
+
+    generated = [
+        Invoice(
+            invoice_id=f"lt-{run_id}-{number}",
+            user_id=random.choice(user_ids),
+            amount=random.randint(100, 100000),
+            final_status="failure" if random.random() < failure_rate else "success"
+        )
+        for number in range(invoices)
+    ]
+
+    connection = await asyncpg.connect(dsn)
+    try:
+        await connection.executemany(
+            """
+            INSERT INTO users (telegram_id, telegram_username, username, chat_id, user_status, is_banned,
+                               warning_count, salt, hashed_password, phone, email)
+            VALUES ($1, 'loadtest', 'loadtest', $1, 'default', false, 0, '', '', $2, '')
+            ON CONFLICT DO NOTHING
+            """,
+            [(user_id, str(user_id)) for user_id in user_ids]
+        )
+        await connection.executemany(
+            "INSERT INTO balance (user_id, balance_money) VALUES ($1, 0) ON CONFLICT DO NOTHING",
+            [(user_id,) for user_id in user_ids]
+        )
+        await connection.copy_records_to_table(
+            "transactions",
+            columns=["invoice_id", "receiver_id", "amount", "commission", "transaction_type",
+                     "transaction_status", "transaction_date"],
+            records=[
+                (invoice.invoice_id, invoice.user_id, invoice.amount, 0, "debit", "pending",
+                 datetime.utcnow())
+                for invoice in generated
+            ]
+        )
+    finally:
+        await connection.close()
+
+    return generated
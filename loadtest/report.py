@@ -0,0 +1,116 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from loadtest.driver import DriverResult
+from loadtest.fake_monobank import Invoice
+
+
+@dataclass
+class DatabaseCounters:
+    statements: Optional[int]
+    transactions: int
+
+
+async def read_database_counters(dsn: str) -> DatabaseCounters:
+    """
+    Snapshot of server-wide statement and transaction counters. Statement counts need the
+    pg_stat_statements extension; without it only transactions are reported.
+    """
+    connection = await asyncpg.connect(dsn)
+    try:
+        try:
+            statements = await connection.fetchval("SELECT sum(calls)::bigint FROM pg_stat_statements")
+        except asyncpg.PostgresError:
+            statements = None
+
+        transactions = await connection.fetchval(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database()"
+        )
+    finally:
+        await connection.close()
+
+    return DatabaseCounters(statements=statements, transactions=transactions)
+
+
+async def wait_for_applied(
+        dsn: str,
+        invoices: List[Invoice],
+        timeout: float,
+        poll_interval: float = 0.02
+) -> Tuple[Dict[str, float], int]:
+    """
+    Poll the transactions table for the monotonic time each invoice left Pending.
+    Also returns the number of polls, so their own statements can be left out of the report.
+    """
+    applied_at = {}
+    polls = 0
+    remaining = [invoice.invoice_id for invoice in invoices]
+    deadline = time.monotonic() + timeout
+
+    connection = await asyncpg.connect(dsn)
+    try:
+        while remaining and time.monotonic() < deadline:
+            rows = await connection.fetch(
+                "SELECT invoice_id FROM transactions WHERE invoice_id = ANY($1) AND transaction_status != 'pending'",
+                remaining
+            )
+            polls += 1
+            now = time.monotonic()
+            for row in rows:
+                applied_at[row["invoice_id"]] = now
+
+            remaining = [invoice_id for invoice_id in remaining if invoice_id not in applied_at]
+            await asyncio.sleep(poll_interval)
+    finally:
+        await connection.close()
+
+    return applied_at, polls
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return float("nan")
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def format_report(
+        invoices: List[Invoice],
+        driver_result: DriverResult,
+        applied_at: Dict[str, float],
+        polls: int,
+        counters_before: DatabaseCounters,
+        counters_after: DatabaseCounters
+) -> str:
+    sent = sum(driver_result.status_codes.values()) + driver_result.errors
+    apply_latencies = [
+        applied_at[invoice_id] - sent_at
+        for invoice_id, sent_at in driver_result.final_sent_at.items()
+        if invoice_id in applied_at
+    ]
+
+    lines = [
+        f"callbacks sent: {sent} in {driver_result.duration:.2f}s ({sent / max(driver_result.duration, 1e-9):.0f}/s)",
+        f"status codes: {driver_result.status_codes}, connection errors: {driver_result.errors}",
+        f"ack latency: p50 {percentile(driver_result.ack_latencies, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(driver_result.ack_latencies, 0.99) * 1000:.1f} ms",
+        f"applied: {len(applied_at)}/{len(invoices)} invoices",
+        f"end-to-end apply latency: p50 {percentile(apply_latencies, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(apply_latencies, 0.99) * 1000:.1f} ms",
+    ]
+
+    transactions = counters_after.transactions - counters_before.transactions - polls
+    lines.append(f"db transactions per callback: {transactions / max(sent, 1):.2f}")
+
+    if counters_before.statements is not None and counters_after.statements is not None:
+        statements = counters_after.statements - counters_before.statements - polls
+        lines.append(f"db statements per callback: {statements / max(sent, 1):.2f}")
+    else:
+        lines.append("db statements per callback: n/a (enable pg_stat_statements)")
+
+    return "\n".join(lines)
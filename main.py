@@ -1,7 +1,6 @@
-from fastapi import FastAPI, Request, status
+from contextlib import asynccontextmanager
 
-from fastapi.responses import JSONResponse
-from fastapi.background import BackgroundTasks
+from fastapi import FastAPI
 
 from dotenv import load_dotenv
 
@@ -16,13 +15,36 @@ from routers.tickets.endpoints import tickets_router
 from routers.withdrawal.endpoints import withdrawal_router
 from routers.warnings.endpoints import warnings_router
 from routers.reviews.endpoints import reviews_router
+from routers.webhooks.endpoints import webhooks_router
+from routers.admin.endpoints import admin_router
 
-from database.cruds.transactions import save_monobank_transaction_data
+from utils.webhook_worker import webhook_workers
+from utils.balance_snapshots import balance_snapshots
+from utils.partition_maintenance import partition_maintenance
+from utils.replica_monitor import replica_monitor
+from database.database import warm_up_engine, dispose_engine, ReadYourWritesMiddleware
 
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up_engine()
+    replica_monitor.start()
+    webhook_workers.start()
+    balance_snapshots.start()
+    partition_maintenance.start()
+    yield
+    await partition_maintenance.stop()
+    await balance_snapshots.stop()
+    await webhook_workers.stop()
+    await replica_monitor.stop()
+    await dispose_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
 
 app.include_router(chats_router)
 app.include_router(users_router)
@@ -36,18 +58,6 @@ app.include_router(tickets_router)
 app.include_router(withdrawal_router)
 app.include_router(warnings_router)
 app.include_router(reviews_router)
+app.include_router(webhooks_router)
+app.include_router(admin_router)
 
-
-@app.post("/webhook/monobank/{user_id}")
-async def monobank_webhook_receiver(request: Request, user_id: int, background_tasks: BackgroundTasks):
-    payload = await request.json()
-    transaction_status = payload.get('status')
-
-    background_tasks.add_task(
-        save_monobank_transaction_data,
-        transaction_status=transaction_status,
-        payload=payload,
-        user_id=user_id
-    )
-
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Received"})
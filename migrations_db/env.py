@@ -1,4 +1,5 @@
 import os
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -37,6 +38,16 @@ POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 
 
+# Monthly partitions of transactions are created and detached at runtime, not by migrations
+PARTITION_NAME = re.compile(r"^transactions_p\d{6}$")
+
+
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return PARTITION_NAME.match(name) is None
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -74,7 +85,8 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,42 @@
+"""Added webhook inbox table
+
+Revision ID: 3c1f9a7d52e4
+Revises: eaf333b5e603
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d52e4'
+down_revision = 'eaf333b5e603'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('webhook_inbox',
+                    sa.Column('inbox_id', sa.BIGINT(), autoincrement=True, nullable=False),
+                    sa.Column('user_id', sa.BIGINT(), nullable=False),
+                    sa.Column('invoice_id', sa.String(), nullable=True),
+                    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+                    sa.Column('status', sa.Enum('pending', 'processed', 'failed', name='inboxstatus'),
+                              server_default='pending', nullable=False),
+                    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+                    sa.Column('last_error', sa.String(), nullable=True),
+                    sa.Column('received_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+                    sa.Column('available_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+                    sa.Column('processed_at', sa.TIMESTAMP(), nullable=True),
+                    sa.PrimaryKeyConstraint('inbox_id')
+                    )
+    op.create_index('ix_webhook_inbox_pending', 'webhook_inbox', ['available_at', 'inbox_id'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_webhook_inbox_pending', table_name='webhook_inbox',
+                  postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('webhook_inbox')
+    op.execute("DROP TYPE inboxstatus")
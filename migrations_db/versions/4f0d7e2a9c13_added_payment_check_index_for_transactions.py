@@ -0,0 +1,28 @@
+"""Added payment check index for transactions
+
+Revision ID: 4f0d7e2a9c13
+Revises: d81e3b5c7a20
+Create Date: 2026-10-18 17:11:06.538920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f0d7e2a9c13'
+down_revision = 'd81e3b5c7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so transfers keep flowing while a large table is indexed
+    with op.get_context().autocommit_block():
+        op.create_index('ix_transactions_payment_check', 'transactions', ['task_id', 'sender_id', 'receiver_id'],
+                        unique=False, postgresql_include=['transaction_status'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transactions_payment_check', table_name='transactions', postgresql_concurrently=True)
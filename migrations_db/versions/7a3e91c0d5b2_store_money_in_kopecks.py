@@ -0,0 +1,57 @@
+"""Store money in kopecks
+
+Revision ID: 7a3e91c0d5b2
+Revises: 4f0d7e2a9c13
+Create Date: 2026-10-18 18:02:41.173305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3e91c0d5b2'
+down_revision = '4f0d7e2a9c13'
+branch_labels = None
+depends_on = None
+
+# (table, column, nullable, precision of the old DECIMAL)
+MONEY_COLUMNS = [
+    ('balance', 'balance_money', False, 10),
+    ('transactions', 'amount', True, 10),
+    ('transactions', 'commission', True, 10),
+    ('withdrawal_requests', 'amount', False, 10),
+    ('withdrawal_requests', 'commission', False, 10),
+    ('ledger_entries', 'amount', False, 12),
+    ('balance_snapshots', 'balance_money', False, 12),
+]
+
+
+def upgrade() -> None:
+    # Every table is rewritten under an exclusive lock, run it in a maintenance window
+    for table, column, nullable, precision in MONEY_COLUMNS:
+        op.alter_column(table, column, type_=sa.BIGINT(),
+                        existing_type=sa.DECIMAL(precision=precision, scale=2), existing_nullable=nullable,
+                        postgresql_using=f'round({column} * 100)::bigint')
+
+    # Prices were free text: take the first number in it ("1 500,50 грн" -> 150050), 0 if there is none
+    op.alter_column('tasks', 'price', type_=sa.BIGINT(), existing_type=sa.String(), existing_nullable=False,
+                    postgresql_using=r"""
+                        coalesce(
+                            round(substring(replace(replace(price, ' ', ''), ',', '.') from '\d+(?:\.\d+)?')::numeric
+                                  * 100),
+                            0
+                        )::bigint
+                    """)
+    op.create_index('ix_tasks_status_price', 'tasks', ['status', 'price'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_status_price', table_name='tasks')
+    op.alter_column('tasks', 'price', type_=sa.String(), existing_type=sa.BIGINT(), existing_nullable=False,
+                    postgresql_using='round(price / 100.0, 2)::text')
+
+    for table, column, nullable, precision in MONEY_COLUMNS:
+        op.alter_column(table, column, type_=sa.DECIMAL(precision=precision, scale=2),
+                        existing_type=sa.BIGINT(), existing_nullable=nullable,
+                        postgresql_using=f'{column} / 100.0')
@@ -0,0 +1,29 @@
+"""Added delivery key for webhook inbox
+
+Revision ID: 9e4b7c0a1d36
+Revises: 3c1f9a7d52e4
+Create Date: 2026-10-18 11:02:47.913550
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7c0a1d36'
+down_revision = '3c1f9a7d52e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('webhook_inbox', sa.Column('invoice_status', sa.String(), nullable=True))
+    op.add_column('webhook_inbox', sa.Column('modified_date', sa.String(), nullable=True))
+    # Rows received before the key existed keep NULLs and therefore never collide
+    op.create_unique_constraint('uq_webhook_inbox_delivery', 'webhook_inbox',
+                                ['invoice_id', 'invoice_status', 'modified_date'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_webhook_inbox_delivery', 'webhook_inbox', type_='unique')
+    op.drop_column('webhook_inbox', 'modified_date')
+    op.drop_column('webhook_inbox', 'invoice_status')
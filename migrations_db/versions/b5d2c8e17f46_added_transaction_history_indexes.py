@@ -0,0 +1,50 @@
+"""Added transaction history indexes
+
+Revision ID: b5d2c8e17f46
+Revises: 7a3e91c0d5b2
+Create Date: 2026-10-18 18:40:12.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2c8e17f46'
+down_revision = '7a3e91c0d5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyset pagination needs a date on every row: rows inserted without one get the date of the
+    # transaction created right before them
+    op.execute("""
+        UPDATE transactions t
+        SET transaction_date = coalesce(
+            (SELECT p.transaction_date FROM transactions p
+             WHERE p.transaction_id < t.transaction_id AND p.transaction_date IS NOT NULL
+             ORDER BY p.transaction_id DESC LIMIT 1),
+            to_timestamp(0) AT TIME ZONE 'utc'
+        )
+        WHERE t.transaction_date IS NULL
+    """)
+    op.alter_column('transactions', 'transaction_date', existing_type=sa.TIMESTAMP(), nullable=False,
+                    server_default=sa.text("timezone('utc', now())"))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_transactions_sender_date', 'transactions',
+                        ['sender_id', 'transaction_date', 'transaction_id'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_transactions_receiver_date', 'transactions',
+                        ['receiver_id', 'transaction_date', 'transaction_id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transactions_receiver_date', table_name='transactions', postgresql_concurrently=True)
+        op.drop_index('ix_transactions_sender_date', table_name='transactions', postgresql_concurrently=True)
+
+    op.alter_column('transactions', 'transaction_date', existing_type=sa.TIMESTAMP(), nullable=True,
+                    server_default=None)
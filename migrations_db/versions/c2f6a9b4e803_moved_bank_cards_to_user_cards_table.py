@@ -0,0 +1,168 @@
+"""Moved bank cards to user_cards table
+
+Revision ID: c2f6a9b4e803
+Revises: 5a8d2e6f0b91
+Create Date: 2026-10-18 15:21:38.604417
+
+"""
+import hashlib
+import hmac
+import os
+from binascii import unhexlify
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# revision identifiers, used by Alembic.
+revision = 'c2f6a9b4e803'
+down_revision = '5a8d2e6f0b91'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+IV_SIZE = algorithms.AES.block_size // 8
+
+balance = sa.table(
+    'balance',
+    sa.column('user_id', sa.BIGINT()),
+    sa.column('user_cards', postgresql.ARRAY(sa.LargeBinary())),
+    sa.column('user_cards_masked', postgresql.ARRAY(sa.String()))
+)
+
+user_cards = sa.table(
+    'user_cards',
+    sa.column('card_id', sa.Integer()),
+    sa.column('user_id', sa.BIGINT()),
+    sa.column('fingerprint', sa.LargeBinary()),
+    sa.column('encrypted_card', sa.LargeBinary()),
+    sa.column('masked_card', sa.String())
+)
+
+
+# Frozen copies of the card helpers of this revision: the legacy fixed-IV format is read and written
+# here, the new rows get a random IV prepended and an HMAC fingerprint, whatever utils.card_tokenization
+# does later
+def encryption_key():
+    return unhexlify(os.getenv('ENCRYPTION_KEY'))
+
+
+def fingerprint_key():
+    encoded_fingerprint_key = os.getenv('CARD_FINGERPRINT_KEY')
+    if encoded_fingerprint_key:
+        return unhexlify(encoded_fingerprint_key)
+    return hmac.new(encryption_key(), b"card-fingerprint", hashlib.sha256).digest()
+
+
+def _encrypt(data, iv):
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    padded_data = padder.update(data) + padder.finalize()
+
+    encryptor = Cipher(algorithms.AES(encryption_key()), modes.CBC(iv)).encryptor()
+    return encryptor.update(padded_data) + encryptor.finalize()
+
+
+def _decrypt(encrypted_data, iv):
+    decryptor = Cipher(algorithms.AES(encryption_key()), modes.CBC(iv)).decryptor()
+    padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
+
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    return unpadder.update(padded_data) + unpadder.finalize()
+
+
+def encrypt_card_number(card_number):
+    iv = os.urandom(IV_SIZE)
+    return iv + _encrypt(card_number.encode(), iv)
+
+
+def decrypt_card_number(encrypted_data):
+    return _decrypt(encrypted_data[IV_SIZE:], encrypted_data[:IV_SIZE]).decode()
+
+
+def legacy_encrypt_card_number(card_number):
+    return _encrypt(card_number.encode(), unhexlify(os.getenv('IV')))
+
+
+def legacy_decrypt_card_number(encrypted_data):
+    return _decrypt(encrypted_data, unhexlify(os.getenv('IV'))).decode()
+
+
+def card_fingerprint(card_number):
+    normalized = "".join(card_number.split())
+    return hmac.new(fingerprint_key(), normalized.encode(), hashlib.sha256).digest()
+
+
+def mask_card_number(card_number):
+    return f"**** {card_number[-4:]}"
+
+
+def upgrade() -> None:
+    op.create_table('user_cards',
+                    sa.Column('card_id', sa.Integer(), autoincrement=True, nullable=False),
+                    sa.Column('user_id', sa.BIGINT(), nullable=False),
+                    sa.Column('fingerprint', sa.LargeBinary(), nullable=False),
+                    sa.Column('encrypted_card', sa.LargeBinary(), nullable=False),
+                    sa.Column('masked_card', sa.String(), nullable=False),
+                    sa.Column('date_added', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('card_id'),
+                    sa.UniqueConstraint('user_id', 'fingerprint', name='uq_user_cards_fingerprint')
+                    )
+
+    connection = op.get_bind()
+
+    # Stream the arrays through a server-side cursor instead of loading every balance at once
+    result = connection.execute(
+        sa.select(balance.c.user_id, balance.c.user_cards).where(balance.c.user_cards.isnot(None)),
+        execution_options={'stream_results': True, 'yield_per': BATCH_SIZE}
+    )
+
+    for rows in result.partitions():
+        cards = []
+        for user_id, encrypted_cards in rows:
+            for encrypted_card in encrypted_cards:
+                card = legacy_decrypt_card_number(encrypted_card)
+                cards.append({
+                    'user_id': user_id,
+                    'fingerprint': card_fingerprint(card),
+                    'encrypted_card': encrypt_card_number(card),
+                    'masked_card': mask_card_number(card)
+                })
+
+        if cards:
+            connection.execute(postgresql.insert(user_cards).on_conflict_do_nothing(), cards)
+
+    op.drop_column('balance', 'user_cards_masked')
+    op.drop_column('balance', 'user_cards')
+
+
+def downgrade() -> None:
+    op.add_column('balance', sa.Column('user_cards', postgresql.ARRAY(sa.LargeBinary()), nullable=True))
+    op.add_column('balance', sa.Column('user_cards_masked', postgresql.ARRAY(sa.String()), nullable=True))
+
+    connection = op.get_bind()
+    result = connection.execute(
+        sa.select(user_cards.c.user_id, user_cards.c.encrypted_card, user_cards.c.masked_card)
+        .order_by(user_cards.c.user_id, user_cards.c.card_id),
+        execution_options={'stream_results': True, 'yield_per': BATCH_SIZE}
+    )
+
+    arrays = {}
+    for rows in result.partitions():
+        for user_id, encrypted_card, masked_card in rows:
+            legacy_cards, masked_cards = arrays.setdefault(user_id, ([], []))
+            legacy_cards.append(legacy_encrypt_card_number(decrypt_card_number(encrypted_card)))
+            masked_cards.append(masked_card)
+
+    for user_id, (legacy_cards, masked_cards) in arrays.items():
+        connection.execute(
+            balance.update().where(balance.c.user_id == user_id).values(
+                user_cards=legacy_cards,
+                user_cards_masked=masked_cards
+            )
+        )
+
+    op.drop_table('user_cards')
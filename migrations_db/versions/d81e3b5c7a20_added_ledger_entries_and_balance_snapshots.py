@@ -0,0 +1,82 @@
+"""Added ledger entries and balance snapshots
+
+Revision ID: d81e3b5c7a20
+Revises: c2f6a9b4e803
+Create Date: 2026-10-18 16:02:54.217306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'd81e3b5c7a20'
+down_revision = 'c2f6a9b4e803'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ledger_entries',
+                    sa.Column('entry_id', sa.BIGINT(), autoincrement=True, nullable=False),
+                    sa.Column('movement_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('account', sa.Enum('user', 'escrow', 'commission', 'external', name='ledgeraccount'),
+                              nullable=False),
+                    sa.Column('user_id', sa.BIGINT(), nullable=True),
+                    sa.Column('amount', sa.DECIMAL(precision=12, scale=2), nullable=False),
+                    sa.Column('reason', sa.Enum('opening', 'deposit', 'adjustment', 'transfer', 'payout',
+                                                name='ledgerreason'), nullable=False),
+                    sa.Column('reference', sa.String(), nullable=True),
+                    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ondelete='SET NULL'),
+                    sa.PrimaryKeyConstraint('entry_id')
+                    )
+    op.create_index('ix_ledger_entries_user', 'ledger_entries', ['user_id', 'created_at'], unique=False,
+                    postgresql_where=sa.text("account = 'user'"))
+    op.create_index('ix_ledger_entries_movement', 'ledger_entries', ['movement_id'], unique=False)
+
+    op.create_table('balance_snapshots',
+                    sa.Column('user_id', sa.BIGINT(), nullable=False),
+                    sa.Column('as_of', sa.TIMESTAMP(), nullable=False),
+                    sa.Column('balance_money', sa.DECIMAL(precision=12, scale=2), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'as_of')
+                    )
+    op.create_index('ix_balance_snapshots_as_of', 'balance_snapshots', ['as_of'], unique=False)
+
+    # Opening movements, so the ledger of every account adds up to what it holds today: current
+    # balances and the escrow of pending transfers, both funded from the external account
+    op.execute("""
+        WITH opening AS MATERIALIZED (
+            SELECT gen_random_uuid() AS movement_id, user_id, balance_money AS amount
+            FROM balance
+            WHERE balance_money <> 0
+        )
+        INSERT INTO ledger_entries (movement_id, account, user_id, amount, reason, reference)
+        SELECT movement_id, 'user'::ledgeraccount, user_id, amount, 'opening'::ledgerreason, NULL FROM opening
+        UNION ALL
+        SELECT movement_id, 'external', NULL, -amount, 'opening', NULL FROM opening
+    """)
+    op.execute("""
+        WITH opening AS MATERIALIZED (
+            SELECT gen_random_uuid() AS movement_id, invoice_id, amount
+            FROM transactions
+            WHERE transaction_type = 'transfer' AND transaction_status = 'pending' AND amount <> 0
+        )
+        INSERT INTO ledger_entries (movement_id, account, user_id, amount, reason, reference)
+        SELECT movement_id, 'escrow'::ledgeraccount, NULL::bigint, amount, 'opening'::ledgerreason, invoice_id
+        FROM opening
+        UNION ALL
+        SELECT movement_id, 'external', NULL, -amount, 'opening', invoice_id FROM opening
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_balance_snapshots_as_of', table_name='balance_snapshots')
+    op.drop_table('balance_snapshots')
+    op.drop_index('ix_ledger_entries_movement', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_user', table_name='ledger_entries',
+                  postgresql_where=sa.text("account = 'user'"))
+    op.drop_table('ledger_entries')
+    op.execute("DROP TYPE ledgerreason")
+    op.execute("DROP TYPE ledgeraccount")
@@ -0,0 +1,120 @@
+"""Partitioned transactions by month
+
+Revision ID: e3a1f6b09d74
+Revises: b5d2c8e17f46
+Create Date: 2026-10-18 19:21:37.466032
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a1f6b09d74'
+down_revision = 'b5d2c8e17f46'
+branch_labels = None
+depends_on = None
+
+# Partitions created after the current month, the app keeps the window moving afterwards
+MONTHS_AHEAD = 3
+MOVE_BATCH_SIZE = 50000
+
+COLUMNS = ('transaction_id, invoice_id, sender_id, receiver_id, task_id, amount, commission, transaction_type, '
+           'transaction_status, transaction_date')
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_transactions_table(primary_key: sa.PrimaryKeyConstraint, **kw):
+    op.create_table('transactions',
+                    sa.Column('transaction_id', sa.Integer(), nullable=False,
+                              server_default=sa.text("nextval('transactions_transaction_id_seq'::regclass)")),
+                    sa.Column('invoice_id', sa.String(), nullable=False),
+                    sa.Column('sender_id', sa.BIGINT(), nullable=True),
+                    sa.Column('receiver_id', sa.BIGINT(), nullable=True),
+                    sa.Column('task_id', sa.Integer(), nullable=True),
+                    sa.Column('amount', sa.BIGINT(), nullable=True),
+                    sa.Column('commission', sa.BIGINT(), nullable=True),
+                    sa.Column('transaction_type', postgresql.ENUM(name='transactiontype', create_type=False),
+                              nullable=False),
+                    sa.Column('transaction_status', postgresql.ENUM(name='transactionstatus', create_type=False),
+                              nullable=False),
+                    sa.Column('transaction_date', sa.TIMESTAMP(), nullable=False,
+                              server_default=sa.text("timezone('utc', now())")),
+                    sa.ForeignKeyConstraint(['receiver_id'], ['users.telegram_id'], ondelete='SET NULL',
+                                            name='transactions_receiver_id_fkey'),
+                    sa.ForeignKeyConstraint(['sender_id'], ['users.telegram_id'], ondelete='SET NULL',
+                                            name='transactions_sender_id_fkey'),
+                    sa.ForeignKeyConstraint(['task_id'], ['tasks.task_id'], name='transactions_task_id_fkey'),
+                    primary_key,
+                    **kw)
+    op.execute('ALTER SEQUENCE transactions_transaction_id_seq OWNED BY transactions.transaction_id')
+
+
+def create_transactions_indexes():
+    op.create_index('ix_transactions_payment_check', 'transactions', ['task_id', 'sender_id', 'receiver_id'],
+                    unique=False, postgresql_include=['transaction_status'])
+    op.create_index('ix_transactions_sender_date', 'transactions', ['sender_id', 'transaction_date', 'transaction_id'],
+                    unique=False)
+    op.create_index('ix_transactions_receiver_date', 'transactions',
+                    ['receiver_id', 'transaction_date', 'transaction_id'], unique=False)
+
+
+def rename_to_legacy():
+    op.rename_table('transactions', 'transactions_legacy')
+    op.execute('ALTER INDEX transactions_pkey RENAME TO transactions_legacy_pkey')
+    for index in ('ix_transactions_payment_check', 'ix_transactions_sender_date', 'ix_transactions_receiver_date'):
+        op.drop_index(index, table_name='transactions_legacy')
+
+
+def upgrade() -> None:
+    # Swaps the table under the app: run it with the app stopped
+    rename_to_legacy()
+    create_transactions_table(sa.PrimaryKeyConstraint('transaction_id', 'invoice_id', 'transaction_date',
+                                                      name='transactions_pkey'),
+                              postgresql_partition_by='RANGE (transaction_date)')
+    create_transactions_indexes()
+
+    # A partition for every month that has rows, and for the months ahead
+    connection = op.get_bind()
+    months = set(connection.execute(
+        sa.text("SELECT DISTINCT date_trunc('month', transaction_date)::date FROM transactions_legacy")
+    ).scalars())
+    current_month = datetime.utcnow().date().replace(day=1)
+    months.update(add_months(current_month, offset) for offset in range(MONTHS_AHEAD + 1))
+
+    for month in sorted(months):
+        op.execute(f"CREATE TABLE transactions_p{month:%Y%m} PARTITION OF transactions "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')")
+
+    # Rows move in batches, each committed on its own, so no single transaction has to hold the
+    # whole table in WAL and locks
+    with op.get_context().autocommit_block():
+        while True:
+            moved = connection.execute(sa.text(f"""
+                WITH moved AS (
+                    DELETE FROM transactions_legacy
+                    WHERE ctid = ANY(ARRAY(SELECT ctid FROM transactions_legacy LIMIT {MOVE_BATCH_SIZE}))
+                    RETURNING {COLUMNS}
+                )
+                INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM moved
+            """))
+            if not moved.rowcount:
+                break
+
+    op.drop_table('transactions_legacy')
+
+
+def downgrade() -> None:
+    # Rows of detached partitions are left where they are
+    rename_to_legacy()
+    create_transactions_table(sa.PrimaryKeyConstraint('transaction_id', 'invoice_id', name='transactions_pkey'))
+    op.execute(f'INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_legacy')
+    create_transactions_indexes()
+    op.drop_table('transactions_legacy')
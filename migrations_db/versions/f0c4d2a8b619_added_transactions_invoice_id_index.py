@@ -0,0 +1,25 @@
+"""Added transactions invoice_id index
+
+Revision ID: f0c4d2a8b619
+Revises: e3a1f6b09d74
+Create Date: 2026-10-18 20:03:52.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0c4d2a8b619'
+down_revision = 'e3a1f6b09d74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Partitioned indexes cannot be built concurrently; writes to transactions wait for the build
+    op.create_index('ix_transactions_invoice_id', 'transactions', ['invoice_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_invoice_id', table_name='transactions')
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Security, Query
+from config import verify_token
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRouter
+
+from database.cruds.reconciliation import reconcile_balances, RECONCILE_BATCH_SIZE
+from database.cruds.exports import stream_export, transactions_export_stmt, withdrawals_export_stmt, ExportFormat, \
+    EXPORT_BATCH_SIZE
+from database.models import TransactionType, TransactionStatus, WithdrawalStatus
+
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Security(verify_token)]
+)
+
+
+async def ndjson_lines(records):
+    async for record in records:
+        yield json.dumps(record, default=str) + "\n"
+
+
+def export_response(chunks, export_format: ExportFormat, name: str) -> StreamingResponse:
+    media_type = "text/csv" if export_format == ExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'})
+
+
+# Balances that do not match their transaction history, streamed as NDJSON with a summary line last
+@admin_router.get("/reconciliation/balances/")
+async def reconcile_balances_report(batch_size: int = RECONCILE_BATCH_SIZE):
+    return StreamingResponse(ndjson_lines(reconcile_balances(batch_size)), media_type="application/x-ndjson")
+
+
+# Transactions for accounting, streamed as CSV or NDJSON. Amounts are in hryvnias, dates in UTC
+@admin_router.get("/exports/transactions/")
+async def export_transactions(
+        export_format: ExportFormat = Query(ExportFormat.csv, alias="format"),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        transaction_type: Optional[TransactionType] = None,
+        transaction_status: Optional[TransactionStatus] = None,
+        batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1)
+):
+    stmt = transactions_export_stmt(date_from, date_to, transaction_type, transaction_status)
+    return export_response(stream_export(stmt, export_format, batch_size), export_format, "transactions")
+
+
+# Withdrawal requests for accounting, streamed as CSV or NDJSON
+@admin_router.get("/exports/withdrawals/")
+async def export_withdrawals(
+        export_format: ExportFormat = Query(ExportFormat.csv, alias="format"),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        withdrawal_status: Optional[WithdrawalStatus] = Query(None, alias="status"),
+        batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1)
+):
+    stmt = withdrawals_export_stmt(date_from, date_to, withdrawal_status)
+    return export_response(stream_export(stmt, export_format, batch_size), export_format, "withdrawals")
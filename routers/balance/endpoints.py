@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from fastapi import status
 from fastapi import Security
 from config import verify_token
@@ -6,9 +8,11 @@ from fastapi.routing import APIRouter
 from fastapi.exceptions import HTTPException
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
-from routers.balance.schemes import UpdateUserCardsRequest, NewBalanceRequest, UpdateBalanceRequest, BalanceResponse
+from routers.balance.schemes import UpdateUserCardsRequest, NewBalanceRequest, UpdateBalanceRequest, BalanceResponse, \
+    BalanceCacheStats, CardExistsResponse, BalanceAtResponse
 from database.cruds.balance import update_balance, get_user_balance, create_user_balance, update_user_cards, \
-    set_new_balance
+    set_new_balance, InsufficientFundsError, get_balance_cache_stats, check_user_card
+from database.cruds.ledger import get_user_balance_at
 
 balance_router = APIRouter(
     prefix="/balance",
@@ -17,15 +21,28 @@ balance_router = APIRouter(
 )
 
 
+# Hit/miss counters of the per-process balance cache
+@balance_router.get("/cache/stats/", response_model=BalanceCacheStats)
+async def balance_cache_stats():
+    return get_balance_cache_stats()
+
+
 # Retrieve a user's balance
 @balance_router.get("/{user_id}", response_model=BalanceResponse)
-async def get_balance(user_id: int):
-    balance = await get_user_balance(user_id)
+async def get_balance(user_id: int, with_pan: bool = False):
+    balance = await get_user_balance(user_id, with_pan=with_pan)
     if not balance:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Balance not found.")
     return balance
 
 
+# Retrieve a user's balance at a past moment (UTC), rebuilt from the ledger
+@balance_router.get("/{user_id}/at/", response_model=BalanceAtResponse)
+async def get_balance_at(user_id: int, moment: datetime):
+    balance_money = await get_user_balance_at(user_id, moment)
+    return {"user_id": user_id, "moment": moment, "balance_money": balance_money}
+
+
 # Create a user's balance
 @balance_router.post("/{user_id}", response_description="Message about successful creation! No data retrieved!")
 async def create_balance(user_id: int):
@@ -45,6 +62,13 @@ async def update_cards_list(update_data: UpdateUserCardsRequest):
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"message": "User cards updated successfully."})
 
 
+# Check whether a user has already saved a card
+@balance_router.post("/user-cards/check/", response_model=CardExistsResponse)
+async def check_card(card_data: UpdateUserCardsRequest):
+    exists = await check_user_card(card_data.user_id, card_data.card)
+    return {"exists": exists}
+
+
 # Create a new balance for a user
 @balance_router.patch("/new/", response_description="Message about successful update! No data retrieved!")
 async def reset_user_balance(request: NewBalanceRequest):
@@ -69,4 +93,6 @@ async def update_balance_request(balance: UpdateBalanceRequest):
         await update_balance(balance.user_id, balance.amount, balance.action)
     except InvalidRequestError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Balance account does not exsist!")
+    except InsufficientFundsError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds on balance!")
     return {"message": "Balance updated successfully."}
@@ -1,8 +1,9 @@
-import decimal
+from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from database.cruds.balance import BalanceAction
+from utils.money import MoneyInput, MoneyOutput
 
 
 class UpdateUserCardsRequest(BaseModel):
@@ -13,17 +14,34 @@ class UpdateUserCardsRequest(BaseModel):
 class BalanceResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     user_cards: List[str]
-    balance_money: decimal.Decimal
+    balance_money: MoneyOutput
     user_id: int
 
 
+class BalanceAtResponse(BaseModel):
+    user_id: int
+    moment: datetime
+    balance_money: MoneyOutput
+
+
+class CardExistsResponse(BaseModel):
+    exists: bool
+
+
 class NewBalanceRequest(BaseModel):
     user_id: int
-    new_amount: decimal.Decimal
+    new_amount: MoneyInput = Field(ge=0)
 
 
 class UpdateBalanceRequest(BaseModel):
     model_config = ConfigDict(use_enum_values=True)
     user_id: int
-    amount: decimal.Decimal
+    amount: MoneyInput = Field(gt=0)
     action: BalanceAction
+
+
+class BalanceCacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
@@ -12,6 +12,11 @@ from routers.chats.schemes import ChatDataRequest, UpdateChatStatusRequest, Upda
     ChatResponse, UpdateChatField
 from routers.users.schemes import UserResponseModel
 from sqlalchemy.exc import IntegrityError, DBAPIError
+from database.models import Chat
+from utils.row_response import schema_columns, rows_response
+
+# Columns behind the response schema, for list endpoints answering straight from rows
+CHAT_RESPONSE_COLUMNS = schema_columns(Chat, ChatResponse)
 
 chats_router = APIRouter(
     prefix="/chats",
@@ -128,8 +133,8 @@ async def update_chat_field(db_chat_id: int, chat_data: UpdateChatField):
 # Get all unused chats
 @chats_router.get("/unused/", response_model=List[ChatResponse])
 async def get_all_unused_chats():
-    chats = await get_unused_chats()
-    return chats
+    chats = await get_unused_chats(columns=CHAT_RESPONSE_COLUMNS)
+    return rows_response(chats, ChatResponse)
 
 
 @chats_router.get("/exists/")
@@ -16,6 +16,11 @@ from database.cruds.executors import get_executor_orders, get_executor, get_all_
     update_executor_application_status, get_executor_applications, TaskStatus
 
 from sqlalchemy.exc import IntegrityError
+from database.models import User
+from utils.row_response import schema_columns, rows_response
+
+# Columns behind the response schema, for list endpoints answering straight from rows
+USER_RESPONSE_COLUMNS = schema_columns(User, UserResponseModel)
 
 executors_router = APIRouter(
     prefix="/executors",
@@ -69,10 +74,10 @@ async def get_executor_data(user_id: int):
 # Retrieve all executors
 @executors_router.get("/", response_model=List[UserResponseModel])
 async def get_all_executors_data():
-    executors = await get_all_executors_profiles()
+    executors = await get_all_executors_profiles(columns=USER_RESPONSE_COLUMNS)
     if not executors:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Executor not found.")
-    return executors
+    return rows_response(executors, UserResponseModel)
 
 
 @executors_router.patch("/applications/")
@@ -3,6 +3,7 @@ from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 from database.models import FileType, ProfileStatus, TaskStatus, PropositionBy
+from utils.money import MoneyOutput
 
 
 class ExecutorProfileRequest(BaseModel):
@@ -36,7 +37,7 @@ class TaskModel(BaseModel):
     executor_id: Optional[int] = None
     client_id: Optional[int] = None
     status: TaskStatus
-    price: str
+    price: MoneyOutput
     date_added: datetime
     deadline: Optional[datetime] = None
     proposed_by: PropositionBy = PropositionBy.public
@@ -1,19 +1,30 @@
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import HTTPException, status, Query
+from fastapi import HTTPException, status, Query, Response, Request
 from fastapi import Security
 from config import verify_token
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 from database.cruds.transactions import add_transaction_data, update_transaction_status, get_user_transactions, \
-    get_transaction_data
-from database.cruds.payments import check_successful_payment, accept_done_offer, create_money_transfer
+    get_transaction_data, TRANSACTIONS_PAGE_SIZE
+from database.cruds.payments import check_successful_payment, accept_done_offer, create_money_transfer, \
+    create_money_transfers, accept_done_offers, wait_for_payment
+from database.cruds.balance import InsufficientFundsError
 from database.models import TransactionType, TransactionStatus
 
 from routers.payments_transactions.schemes import TransactionDataRequest, UpdateTransactionStatusRequest, \
-    AcceptDoneOfferRequest, CreateTransfer, TransactionResponse, SuccessPayment
+    AcceptDoneOfferRequest, CreateTransfer, TransactionResponse, SuccessPayment, BatchTransferRequest, \
+    BatchAcceptOfferRequest, BatchResponse, BatchItemStatus, BulkIngestResponse
 
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
+from utils.pagination import encode_cursor, decode_cursor
+from utils.transaction_ingest import ingest_transactions, INGEST_CHUNK_SIZE
+
+# Longest a payment check may be held open in long-poll mode, in seconds
+PAYMENT_MAX_WAIT = 30
+
+TRANSACTIONS_MAX_PAGE_SIZE = 200
 
 payments_router = APIRouter(
     prefix="/payments",
@@ -42,6 +53,20 @@ async def add_transaction(transaction_data: TransactionDataRequest):
                         status_code=status.HTTP_201_CREATED)
 
 
+# Bulk load of transactions from an NDJSON body (one TransactionDataRequest-like object per line, with an
+# optional transaction_date). The body is read and written chunk by chunk, a failing chunk does not stop the load
+@transactions_router.post("/bulk", response_model=BulkIngestResponse)
+async def bulk_add_transactions(request: Request, chunk_size: int = Query(INGEST_CHUNK_SIZE, ge=1, le=50000)):
+    problems = []
+
+    async for report in ingest_transactions(request.stream(), chunk_size):
+        if "summary" in report:
+            return {"summary": report["summary"], "problems": problems}
+
+        if report["invalid"] or report["error"] is not None:
+            problems.append(report)
+
+
 # Update transaction status
 @transactions_router.patch("/")
 async def update_transaction(transaction_data: UpdateTransactionStatusRequest):
@@ -53,12 +78,38 @@ async def update_transaction(transaction_data: UpdateTransactionStatusRequest):
     return JSONResponse(content={"message": "Transaction status updated successfully."}, status_code=status.HTTP_200_OK)
 
 
-# Get transactions for a user
+# Get a page of transactions for a user, newest first. The cursor of the next page, if there is one,
+# comes in the X-Next-Cursor header
 @transactions_router.get("/{user_id}", response_model=List[TransactionResponse])
-async def get_transactions(user_id: int):
-    transactions = await get_user_transactions(user_id)
-    if not transactions:
+async def get_transactions(
+        user_id: int,
+        response: Response,
+        limit: int = Query(TRANSACTIONS_PAGE_SIZE, ge=1, le=TRANSACTIONS_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        transaction_type: Optional[TransactionType] = None,
+        transaction_status: Optional[TransactionStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+):
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+    transactions, last_key = await get_user_transactions(
+        user_id,
+        limit=limit,
+        after=after,
+        transaction_type=transaction_type,
+        transaction_status=transaction_status,
+        date_from=date_from,
+        date_to=date_to
+    )
+    if not transactions and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No transactions found!")
+
+    if last_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*last_key)
     return transactions
 
 
@@ -68,14 +119,18 @@ async def get_transaction_transfer(
         receiver_id: int,
         task_id: Optional[int] = None,
         transaction_type: Optional[TransactionType] = None,
-        transaction_status: Optional[TransactionStatus] = None
+        transaction_status: Optional[TransactionStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
 ):
     transactions = await get_transaction_data(
         sender_id=sender_id,
         receiver_id=receiver_id,
         task_id=task_id,
         transaction_type=transaction_type,
-        transaction_status=transaction_status
+        transaction_status=transaction_status,
+        date_from=date_from,
+        date_to=date_to
     )
 
     if not transactions:
@@ -92,6 +147,8 @@ async def perform_money_transfer(transfer_data: CreateTransfer):
     except ValueError as err:
         print(err)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect balance amount of sender!")
+    except InvalidRequestError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Balance account of sender does not exist!")
     except IntegrityError as err:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Unprocessable data for transfer!")
@@ -99,10 +156,47 @@ async def perform_money_transfer(transfer_data: CreateTransfer):
     return transaction
 
 
-# Check for successful payment
+def batch_error(err: Exception) -> str:
+    if isinstance(err, InsufficientFundsError):
+        return "Incorrect balance amount of sender!"
+    if isinstance(err, InvalidRequestError):
+        return str(err)
+    return "Unprocessable data!"
+
+
+def batch_results(outcomes) -> list:
+    results = []
+
+    for index, (row, err) in enumerate(outcomes):
+        if row is not None:
+            results.append({"index": index, "status": BatchItemStatus.applied, "transaction_id": row.transaction_id})
+        elif err is None:
+            results.append({"index": index, "status": BatchItemStatus.rolled_back})
+        else:
+            results.append({"index": index, "status": BatchItemStatus.failed, "error": batch_error(err)})
+
+    return results
+
+
+# Create several transfers with one commit; "partial" mode keeps the items that succeeded
+@payments_router.post("/transfer/batch", response_model=BatchResponse)
+async def perform_money_transfers(batch: BatchTransferRequest):
+    committed, outcomes = await create_money_transfers([item.model_dump() for item in batch.items], batch.mode)
+    return {"committed": committed, "results": batch_results(outcomes)}
+
+
+# Check for successful payment; with `wait` set, hold the request up to that many seconds until it appears
 @payments_router.get("/{task_id:int}/{receiver_id:int}/{sender_id:int}", response_model=SuccessPayment)
-async def check_payment(task_id: int, receiver_id: int, sender_id: int):
-    success = await check_successful_payment(task_id, receiver_id, sender_id)
+async def check_payment(
+        task_id: int,
+        receiver_id: int,
+        sender_id: int,
+        wait: float = Query(0, ge=0, le=PAYMENT_MAX_WAIT)
+):
+    if wait:
+        success = await wait_for_payment(task_id, receiver_id, sender_id, timeout=wait)
+    else:
+        success = await check_successful_payment(task_id, receiver_id, sender_id)
     return JSONResponse(content={"status": success}, status_code=status.HTTP_200_OK)
 
 
@@ -114,3 +208,10 @@ async def accept_offer(payment_data: AcceptDoneOfferRequest):
         return {"message": "Offer accepted and task marked as done."}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+# Accept several done offers with one commit; "partial" mode keeps the items that succeeded
+@payments_router.post("/accept-offer/batch", response_model=BatchResponse)
+async def accept_offers(batch: BatchAcceptOfferRequest):
+    committed, outcomes = await accept_done_offers([item.model_dump() for item in batch.items], batch.mode)
+    return {"committed": committed, "results": batch_results(outcomes)}
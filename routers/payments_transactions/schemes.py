@@ -1,7 +1,11 @@
-from pydantic import BaseModel, ConfigDict, condecimal
+import enum
+
+from pydantic import BaseModel, ConfigDict, Field
 from database.models import TransactionType, TransactionStatus
+from database.cruds.payments import BatchMode
+from utils.money import MoneyInput, MoneyOutput
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 class SuccessPayment(BaseModel):
@@ -11,8 +15,8 @@ class SuccessPayment(BaseModel):
 class TransactionDataRequest(BaseModel):
     model_config = ConfigDict(use_enum_values=True)
     invoice_id: str
-    amount: condecimal(max_digits=10, decimal_places=2)
-    commission: Optional[condecimal(max_digits=10, decimal_places=2)] = None
+    amount: MoneyInput
+    commission: Optional[MoneyInput] = None
     transaction_type: TransactionType
     transaction_status: TransactionStatus
     sender_id: Optional[int] = None
@@ -27,8 +31,8 @@ class TransactionResponse(BaseModel):
     sender_id: Optional[int] = None
     receiver_id: Optional[int] = None
     task_id: Optional[int] = None
-    amount: condecimal(max_digits=10, decimal_places=2)
-    commission: Optional[condecimal(max_digits=10, decimal_places=2)] = None
+    amount: MoneyOutput
+    commission: Optional[MoneyOutput] = None
     transaction_type: TransactionType
     transaction_status: TransactionStatus
     transaction_date: Optional[datetime] = None
@@ -45,9 +49,74 @@ class CreateTransfer(BaseModel):
     receiver_id: int
     sender_id: int
     task_id: int
-    amount: condecimal(max_digits=10, decimal_places=2)
+    amount: MoneyInput = Field(gt=0)
+
 
 class AcceptDoneOfferRequest(BaseModel):
     transaction_id: int
     task_id: int
     receiver_id: int
+
+
+class BatchTransferRequest(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    mode: BatchMode = BatchMode.atomic
+    items: List[CreateTransfer] = Field(min_length=1, max_length=500)
+
+
+class BatchAcceptOfferRequest(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    mode: BatchMode = BatchMode.atomic
+    items: List[AcceptDoneOfferRequest] = Field(min_length=1, max_length=500)
+
+
+class BatchItemStatus(enum.StrEnum):
+    applied: str = "applied"
+    failed: str = "failed"
+    rolled_back: str = "rolled_back"
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: BatchItemStatus
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchItemResult]
+
+
+class IngestLineError(BaseModel):
+    line: int
+    error: str
+
+
+class IngestChunkReport(BaseModel):
+    chunk: int
+    first_line: int
+    last_line: int
+    rows: int
+    inserted: int
+    skipped: int
+    invalid: int
+    invalid_lines: List[IngestLineError]
+    error: Optional[str] = None
+
+
+class IngestSummary(BaseModel):
+    rows: int
+    inserted: int
+    skipped: int
+    invalid: int
+    failed_chunks: int
+    chunks: int
+    elapsed: float
+    rows_per_second: int
+
+
+class BulkIngestResponse(BaseModel):
+    summary: IngestSummary
+    # Only chunks with invalid lines or a database error
+    problems: List[IngestChunkReport]
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import status, Query
 from fastapi import Security
@@ -7,7 +7,7 @@ from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 from fastapi.exceptions import HTTPException
 
-from database.models import TaskStatus, PropositionBy
+from database.models import TaskStatus, PropositionBy, Task
 from routers.tasks.schemes import TaskCreateRequest, TaskUpdateStatusRequest, TaskResponse
 
 from database.cruds.tasks import save_task_to_db, update_task_status, get_all_tasks, get_user_by_task_id, get_task, \
@@ -15,6 +15,11 @@ from database.cruds.tasks import save_task_to_db, update_task_status, get_all_ta
 
 from sqlalchemy.exc import IntegrityError
 from routers.users.schemes import UserResponseModel
+from utils.money import MoneyInput
+from utils.row_response import schema_columns, rows_response
+
+# Columns behind the response schema, for list endpoints answering straight from rows
+TASK_RESPONSE_COLUMNS = schema_columns(Task, TaskResponse)
 
 task_router = APIRouter(
     prefix="/tasks",
@@ -59,12 +64,15 @@ async def get_all_tasks_db(
         user_type: UserType,
         task_id: int = None,
         task_status: List[TaskStatus] = Query(),
+        min_price: Optional[MoneyInput] = None,
+        max_price: Optional[MoneyInput] = None,
 ):
     try:
-        tasks = await get_all_tasks(user_id, user_type, *task_status, task_id=task_id)
+        tasks = await get_all_tasks(user_id, user_type, *task_status, task_id=task_id,
+                                    min_price=min_price, max_price=max_price, columns=TASK_RESPONSE_COLUMNS)
     except IntegrityError as err:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error with retrieving data!")
-    return tasks
+    return rows_response(tasks, TaskResponse)
 
 
 @task_router.get("/client-by-task/{task_id}", response_model=UserResponseModel)
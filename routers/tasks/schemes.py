@@ -4,13 +4,14 @@ from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 
 from database.models import FileType, PropositionBy, TaskStatus
+from utils.money import MoneyInput, MoneyOutput
 
 
 class TaskCreateRequest(BaseModel):
     model_config = ConfigDict(use_enum_values=True)
     client_id: int
     status: TaskStatus
-    price: str
+    price: MoneyInput
     subjects: List[str]
     work_type: List[str]
     deadline: Optional[date] = None
@@ -24,6 +25,7 @@ class TaskCreateRequest(BaseModel):
 class TaskResponse(TaskCreateRequest):
     model_config = ConfigDict(from_attributes=True, use_enum_values=True)
     task_id: int
+    price: MoneyOutput
 
 
 class TaskUpdateStatusRequest(BaseModel):
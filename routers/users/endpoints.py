@@ -1,16 +1,24 @@
 from typing import List
-from fastapi import Security
+from fastapi import Security, Depends
 from config import verify_token
 from fastapi.routing import APIRouter
 from fastapi.exceptions import HTTPException
 from fastapi import status
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from routers.users.schemes import UserCreateRequest, UserUpdateRequest, BanStatusRequest, GetSimilarityUsersRequest, \
     UserResponseModel
 
-from database.cruds.users import get_user_auth, delete_user_from_db, save_user_to_db, update_user_email, \
-    update_user_phone, update_user_nickname, get_default_users, update_ban_status, get_similarity_users
+from database.cruds.users import get_user_auth, delete_user_from_db, save_user_to_db, update_user_fields, \
+    get_default_users, update_ban_status, get_similarity_users
+from database.database import get_session
+from database.models import User
+from utils.row_response import schema_columns, rows_response
+
+# Columns behind the response schema, for list endpoints answering straight from rows
+USER_RESPONSE_COLUMNS = schema_columns(User, UserResponseModel)
 
 users_router = APIRouter(
     prefix="/users",
@@ -30,9 +38,10 @@ async def get_user(telegram_id: int):
 
 # Delete a user
 @users_router.delete("/{telegram_id}")
-async def delete_user(telegram_id: int):
+async def delete_user(telegram_id: int, session: AsyncSession = Depends(get_session)):
     try:
-        await delete_user_from_db(telegram_id)
+        await delete_user_from_db(telegram_id, session)
+        await session.commit()
     except Exception as err:
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -42,47 +51,63 @@ async def delete_user(telegram_id: int):
 
 # Create a new user
 @users_router.post("/")
-async def create_user(user_data: UserCreateRequest):
-    result = await save_user_to_db(**user_data.model_dump())
+async def create_user(user_data: UserCreateRequest, session: AsyncSession = Depends(get_session)):
+    result = await save_user_to_db(**user_data.model_dump(), session=session)
     if not result:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User could not be created.")
+    await session.commit()
     return JSONResponse(status_code=status.HTTP_201_CREATED, content={"message": "User created successfully"})
 
 
-# Update user details
+# Update user details, all given fields in one statement
 @users_router.patch("/{telegram_id}")
-async def update_user(telegram_id: int, user_data: UserUpdateRequest):
+async def update_user(telegram_id: int, user_data: UserUpdateRequest, session: AsyncSession = Depends(get_session)):
+    fields = {
+        column: value
+        for column, value in (("email", user_data.email), ("username", user_data.nickname), ("phone", user_data.phone))
+        if value
+    }
+
     try:
-        if user_data.email:
-            await update_user_email(telegram_id, user_data.email)
-        if user_data.nickname:
-            await update_user_nickname(telegram_id, user_data.nickname)
-        if user_data.phone:
-            await update_user_phone(telegram_id, user_data.phone)
+        found = await update_user_fields(telegram_id, fields, session)
+        await session.commit()
+    except IntegrityError as err:
+        print(err)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Phone number is already in use!")
     except Exception as err:
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="User details can not been updated!")
+
+    if not found:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
     return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "User updated successfully."})
 
 
 # Retrieve regular users
 @users_router.get("/default-users/", response_model=List[UserResponseModel])
 async def get_my_users_except_admins():
-    users = await get_default_users()
+    users = await get_default_users(USER_RESPONSE_COLUMNS)
     if not users:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No users found!")
-    return users
+    return rows_response(users, UserResponseModel)
 
 
 # Endpoint to update a user's ban status
 @users_router.patch("/ban/")
-async def ban_user(request: BanStatusRequest):
+async def ban_user(request: BanStatusRequest, session: AsyncSession = Depends(get_session)):
     try:
-        await update_ban_status(request.user_id, request.is_banned)
+        found = await update_ban_status(request.user_id, request.is_banned, session)
+        await session.commit()
+    except IntegrityError as err:
+        print(err)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ban status conflicts with the user data!")
     except Exception as err:
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User can not be updated!")
+
+    if not found:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
     return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Ban status updated successfully."})
 
 
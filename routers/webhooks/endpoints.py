@@ -0,0 +1,48 @@
+from fastapi import Request, status, Header
+from fastapi.exceptions import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRouter
+from pydantic import ValidationError
+
+from database.cruds.webhooks import save_webhook_to_inbox
+from routers.webhooks.schemes import MonobankWebhookPayload
+from utils.monobank_signature import verify_monobank_signature, MONOBANK_TOKEN, MONOBANK_SKIP_SIGNATURE
+from utils.webhook_worker import webhook_workers
+
+webhooks_router = APIRouter(
+    prefix="/webhook",
+    tags=["webhook"]
+)
+
+if MONOBANK_SKIP_SIGNATURE:
+    print("MONOBANK_SKIP_SIGNATURE is set, Monobank webhook signatures will not be verified!")
+elif not MONOBANK_TOKEN:
+    print("MONOBANK_TOKEN is not set, Monobank webhooks will be rejected!")
+
+
+# Receive Monobank invoice status callbacks
+@webhooks_router.post("/monobank/{user_id}")
+async def monobank_webhook_receiver(request: Request, user_id: int, x_sign: str = Header(default=None)):
+    body = await request.body()
+
+    if not MONOBANK_SKIP_SIGNATURE:
+        # Without the token the merchant key cannot be fetched, so nothing could be verified
+        if not MONOBANK_TOKEN:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Webhook signature verification is not configured!")
+
+        if not await verify_monobank_signature(body, x_sign):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid X-Sign signature!")
+
+    try:
+        payload = MonobankWebhookPayload.model_validate_json(body)
+    except ValidationError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+    if await save_webhook_to_inbox(
+            user_id=user_id,
+            payload=payload.model_dump(mode="json", by_alias=True, exclude_none=True)
+    ):
+        webhook_workers.notify()
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Received"})
@@ -0,0 +1,28 @@
+import enum
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class MonobankInvoiceStatus(enum.StrEnum):
+    created: str = "created"
+    processing: str = "processing"
+    hold: str = "hold"
+    success: str = "success"
+    failure: str = "failure"
+    reversed: str = "reversed"
+    expired: str = "expired"
+
+
+class MonobankWebhookPayload(BaseModel):
+    model_config = ConfigDict(strict=True, extra="ignore", populate_by_name=True)
+    invoice_id: str = Field(alias="invoiceId")
+    status: MonobankInvoiceStatus
+    amount: int
+    ccy: int
+    final_amount: Optional[int] = Field(default=None, alias="finalAmount")
+    reference: Optional[str] = None
+    failure_reason: Optional[str] = Field(default=None, alias="failureReason")
+    err_code: Optional[str] = Field(default=None, alias="errCode")
+    created_date: str = Field(alias="createdDate")
+    modified_date: str = Field(alias="modifiedDate")
@@ -6,9 +6,13 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
 from fastapi.routing import APIRouter
 from routers.withdrawal.schemes import WithdrawalRequestModel, UpdateWithdrawalRequestModel, WithdrawalResponse
-from database.models import WithdrawalStatus
+from database.models import WithdrawalStatus, WithdrawalRequest
 from database.cruds.withdrawals import create_withdrawal_request, get_all_withdrawal_requests, update_withdrawal_request
 from sqlalchemy.exc import IntegrityError
+from utils.row_response import schema_columns, rows_response
+
+# Columns behind the response schema, for list endpoints answering straight from rows
+WITHDRAWAL_RESPONSE_COLUMNS = schema_columns(WithdrawalRequest, WithdrawalResponse)
 
 withdrawal_router = APIRouter(
     prefix="/withdrawals",
@@ -29,8 +33,8 @@ async def create_withdrawal(request: WithdrawalRequestModel):
 # Get all withdrawal requests
 @withdrawal_router.get("/{status}", response_model=List[WithdrawalResponse])
 async def get_all_withdrawals(status: WithdrawalStatus):
-    requests = await get_all_withdrawal_requests(status)
-    return requests
+    requests = await get_all_withdrawal_requests(status, columns=WITHDRAWAL_RESPONSE_COLUMNS)
+    return rows_response(requests, WithdrawalResponse)
 
 
 # Update a withdrawal request
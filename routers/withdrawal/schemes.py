@@ -1,6 +1,7 @@
 
-from pydantic import BaseModel, ConfigDict, condecimal
+from pydantic import BaseModel, ConfigDict, Field
 from database.models import WithdrawalStatus
+from utils.money import MoneyInput, MoneyOutput
 from typing import Optional
 from datetime import datetime
 
@@ -8,8 +9,8 @@ from datetime import datetime
 class WithdrawalRequestModel(BaseModel):
     model_config = ConfigDict(use_enum_values=True)
     user_id: int
-    amount: condecimal(max_digits=10, decimal_places=2)
-    commission: condecimal(max_digits=10, decimal_places=2)
+    amount: MoneyInput = Field(gt=0)
+    commission: MoneyInput = Field(ge=0)
     status: WithdrawalStatus
     payment_method: str
 
@@ -27,8 +28,8 @@ class WithdrawalResponse(BaseModel):
     model_config = ConfigDict(use_enum_values=True, from_attributes=True)
     request_id: int
     user_id: int
-    amount: condecimal(max_digits=10, decimal_places=2)
-    commission: condecimal(max_digits=10, decimal_places=2)
+    amount: MoneyOutput
+    commission: MoneyOutput
     request_date: datetime
     status: WithdrawalStatus
     payment_method: str
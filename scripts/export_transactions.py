@@ -0,0 +1,85 @@
+"""
+Export transactions or withdrawal requests for accounting.
+
+Usage: python -m scripts.export_transactions [--table transactions|withdrawals] [--format csv|ndjson]
+                                             [--date-from ISO] [--date-to ISO] [--type TYPE] [--status STATUS]
+                                             [--output FILE]
+CSV is produced by Postgres itself through COPY ... TO STDOUT; NDJSON is streamed through a
+server-side cursor. Either way memory use does not grow with the size of the export.
+Writes to stdout unless --output is given.
+"""
+import argparse
+import asyncio
+import contextlib
+import sys
+from datetime import datetime
+from typing import Optional
+
+from database.database import engine
+from database.cruds.exports import copy_export, stream_export, transactions_export_stmt, withdrawals_export_stmt, \
+    ExportFormat, EXPORT_BATCH_SIZE
+from database.models import TransactionType, TransactionStatus, WithdrawalStatus
+
+
+def labels(enum_class) -> str:
+    return ", ".join(enum_class.__members__)
+
+
+def enum_filter(enum_class, option: str, label: Optional[str]):
+    # Filters take the labels the export writes, which are the stored enum names
+    if label is None:
+        return None
+    if label not in enum_class.__members__:
+        raise SystemExit(f"{option} must be one of: {labels(enum_class)}")
+    return enum_class[label]
+
+
+def build_stmt(args):
+    if args.table == "withdrawals":
+        if args.type is not None:
+            raise SystemExit("--type only applies to transactions")
+        status = enum_filter(WithdrawalStatus, "--status", args.status)
+        return withdrawals_export_stmt(args.date_from, args.date_to, status)
+
+    transaction_type = enum_filter(TransactionType, "--type", args.type)
+    transaction_status = enum_filter(TransactionStatus, "--status", args.status)
+    return transactions_export_stmt(args.date_from, args.date_to, transaction_type, transaction_status)
+
+
+async def run(args) -> int:
+    # SQL echo goes to stdout and would end up in the export
+    engine.echo = False
+    stmt = build_stmt(args)
+
+    if args.format == ExportFormat.csv:
+        return await copy_export(stmt, args.output or sys.stdout.buffer)
+
+    rows = 0
+    with open(args.output, "w") if args.output else contextlib.nullcontext(sys.stdout) as output:
+        async for chunk in stream_export(stmt, ExportFormat.ndjson, args.batch_size):
+            output.write(chunk)
+            rows += chunk.count("\n")
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accounting export")
+    parser.add_argument("--table", choices=["transactions", "withdrawals"], default="transactions")
+    parser.add_argument("--format", type=ExportFormat, choices=list(ExportFormat), default=ExportFormat.csv)
+    parser.add_argument("--date-from", type=datetime.fromisoformat, help="Inclusive, UTC")
+    parser.add_argument("--date-to", type=datetime.fromisoformat, help="Exclusive, UTC")
+    parser.add_argument("--type", help=f"Transaction type: {labels(TransactionType)}")
+    parser.add_argument("--status", help=f"Transaction status: {labels(TransactionStatus)}; "
+                                         f"withdrawal status: {labels(WithdrawalStatus)}")
+    parser.add_argument("--output", help="File to write instead of stdout")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE,
+                        help="Rows fetched from the server-side cursor at a time (NDJSON only)")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    print(f"Exported {rows} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Bulk load transactions from an NDJSON file, e.g. a backfill of historical Monobank invoices.
+
+Usage: python -m scripts.ingest_transactions [FILE] [--chunk-size N]
+Each line is a transaction as accepted by POST /transactions/ (amounts in hryvnias) with an optional
+transaction_date. Reads stdin when no file is given. Prints one JSON report per chunk and a summary
+last; invoices already stored are skipped, so a failed load can simply be re-run.
+Exits with status 1 when any line was invalid or any chunk failed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import AsyncIterator, BinaryIO
+
+from database.database import engine
+from utils.transaction_ingest import ingest_transactions, INGEST_CHUNK_SIZE
+
+READ_SIZE = 1 << 20
+
+
+async def read_blocks(source: BinaryIO) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+
+    while True:
+        block = await loop.run_in_executor(None, source.read, READ_SIZE)
+        if not block:
+            return
+        yield block
+
+
+async def run(path: str, chunk_size: int) -> bool:
+    # SQL echo goes to stdout and would interleave with the report
+    engine.echo = False
+    clean = True
+
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as source:
+        async for report in ingest_transactions(read_blocks(source), chunk_size):
+            print(json.dumps(report))
+
+            if "summary" in report:
+                clean = not report["summary"]["invalid"] and not report["summary"]["failed_chunks"]
+
+    return clean
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk transaction ingestion")
+    parser.add_argument("file", nargs="?", default="-", help="NDJSON file, - for stdin")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE,
+                        help="Lines validated and written per transaction")
+    args = parser.parse_args()
+
+    clean = asyncio.run(run(args.file, args.chunk_size))
+    sys.exit(0 if clean else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Create upcoming and detach expired monthly partitions of transactions, then list the attached ones.
+
+Usage: python -m scripts.manage_partitions [--ahead N] [--retain N] [--list-only]
+The app does the same once a day on its own (PARTITION_MAINTENANCE_INTERVAL); this is for running it
+from cron or by hand, e.g. before enabling retention.
+"""
+import argparse
+import asyncio
+
+from database.database import engine, async_session
+from database.cruds.partitions import maintain_transaction_partitions, list_transaction_partitions, \
+    TRANSACTION_PARTITIONS_AHEAD, TRANSACTION_PARTITIONS_RETAIN
+
+
+async def run(months_ahead: int, retain_months: int, list_only: bool):
+    engine.echo = False
+
+    if not list_only:
+        created, detached = await maintain_transaction_partitions(months_ahead, retain_months)
+        print(f"created: {', '.join(created) or '-'}")
+        print(f"detached: {', '.join(detached) or '-'}")
+
+    async with async_session() as session:
+        partitions = await list_transaction_partitions(session)
+
+    for name, month in partitions:
+        print(f"{name}\t{month:%Y-%m}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction partition maintenance")
+    parser.add_argument("--ahead", type=int, default=TRANSACTION_PARTITIONS_AHEAD,
+                        help="Months to create after the current one")
+    parser.add_argument("--retain", type=int, default=TRANSACTION_PARTITIONS_RETAIN,
+                        help="Months of history to keep attached, 0 keeps all")
+    parser.add_argument("--list-only", action="store_true", help="Only list the attached partitions")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.ahead, args.retain, args.list_only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare every balance with the sum of its transaction and withdrawal history.
+
+Usage: python -m scripts.reconcile_balances [--batch-size N]
+Prints one JSON line per mismatching balance and a summary line last.
+Exits with status 1 when any balance does not match.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from database.database import engine
+from database.cruds.reconciliation import reconcile_balances, RECONCILE_BATCH_SIZE
+
+
+async def run(batch_size: int) -> int:
+    # SQL echo goes to stdout and would interleave with the report
+    engine.echo = False
+    mismatched = 0
+
+    async for record in reconcile_balances(batch_size):
+        print(json.dumps(record, default=str))
+
+        if "summary" in record:
+            mismatched = record["summary"]["mismatched"]
+
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance reconciliation")
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE,
+                        help="Rows fetched from the server-side cursor at a time")
+    args = parser.parse_args()
+
+    mismatched = asyncio.run(run(args.batch_size))
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from database.cruds.ledger import take_balance_snapshots
+
+load_dotenv()
+
+BALANCE_SNAPSHOT_INTERVAL = float(os.getenv("BALANCE_SNAPSHOT_INTERVAL", 3600))
+BALANCE_SNAPSHOT_SETTLE = float(os.getenv("BALANCE_SNAPSHOT_SETTLE", 60))
+
+
+class BalanceSnapshotScheduler:
+    """
+    Background task snapshotting user balances every `interval` seconds, so balance-at-time queries
+    only have to sum the ledger tail after the latest snapshot.
+    """
+
+    def __init__(self, interval: float = BALANCE_SNAPSHOT_INTERVAL, settle: float = BALANCE_SNAPSHOT_SETTLE):
+        self.interval = interval
+        self.settle = settle
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="balance-snapshots")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await take_balance_snapshots(self.settle)
+            except Exception as err:
+                print(f"Balance snapshot failed: {err}")
+
+            await asyncio.sleep(self.interval)
+
+
+balance_snapshots = BalanceSnapshotScheduler()
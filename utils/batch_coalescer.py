@@ -0,0 +1,46 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class BatchCoalescer:
+    """
+    Groups items submitted under the same key within a short window and flushes them together.
+
+    The first submit for a key opens a window of `window` seconds; every item submitted for that
+    key before it closes is handed to one `flush(key, items)` call. Each submitter awaits the
+    outcome of the flush its item ended up in.
+    """
+
+    def __init__(self, flush: Callable[[Hashable, List[Any]], Awaitable[Any]], window: float):
+        self.flush = flush
+        self.window = window
+
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, item: Any):
+        future = asyncio.get_running_loop().create_future()
+
+        if key not in self._pending:
+            self._pending[key] = []
+            flush_task = asyncio.create_task(self._flush_after_window(key))
+            self._flushes.add(flush_task)
+            flush_task.add_done_callback(self._flushes.discard)
+
+        self._pending[key].append((item, future))
+        return await future
+
+    async def _flush_after_window(self, key: Hashable):
+        await asyncio.sleep(self.window)
+        batch = self._pending.pop(key)
+
+        try:
+            result = await self.flush(key, [item for item, _ in batch])
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(result)
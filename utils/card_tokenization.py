@@ -1,3 +1,5 @@
+import hashlib
+import hmac
 import os
 
 from binascii import unhexlify
@@ -10,31 +12,55 @@ from cryptography.hazmat.backends import default_backend
 load_dotenv()
 
 encoded_key = os.getenv('ENCRYPTION_KEY')
-encoded_iv = os.getenv('IV')
+encoded_fingerprint_key = os.getenv('CARD_FINGERPRINT_KEY')
 
 KEY = unhexlify(encoded_key)
-IV = unhexlify(encoded_iv)
+# Without a dedicated key, derive one from the encryption key so fingerprints never reuse it directly
+FINGERPRINT_KEY = unhexlify(encoded_fingerprint_key) if encoded_fingerprint_key else hmac.new(
+    KEY, b"card-fingerprint", hashlib.sha256
+).digest()
 
+IV_SIZE = algorithms.AES.block_size // 8
 
-def encrypt_card_number(card_number, key=KEY, iv=IV):
-    data = card_number.encode()
 
+def _encrypt(data, key, iv):
     padder = padding.PKCS7(algorithms.AES.block_size).padder()
     padded_data = padder.update(data) + padder.finalize()
 
     cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
     encryptor = cipher.encryptor()
-    encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
+    return encryptor.update(padded_data) + encryptor.finalize()
 
-    return encrypted_data
 
-
-def decrypt_card_number(encrypted_data, key=KEY, iv=IV):
+def _decrypt(encrypted_data, key, iv):
     cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
     decryptor = cipher.decryptor()
 
     padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
     unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
-    data = unpadder.update(padded_data) + unpadder.finalize()
+    return unpadder.update(padded_data) + unpadder.finalize()
+
+
+def encrypt_card_number(card_number, key=KEY):
+    """
+    Encrypts a card number with a fresh random IV.
+    :return: The IV followed by the ciphertext.
+    """
+    iv = os.urandom(IV_SIZE)
+    return iv + _encrypt(card_number.encode(), key, iv)
+
+
+def decrypt_card_number(encrypted_data, key=KEY):
+    return _decrypt(encrypted_data[IV_SIZE:], key, encrypted_data[:IV_SIZE]).decode()
+
+
+def card_fingerprint(card_number, key=FINGERPRINT_KEY):
+    """
+    Keyed fingerprint of a card number, used to find and deduplicate cards without decrypting them.
+    """
+    normalized = "".join(card_number.split())
+    return hmac.new(key, normalized.encode(), hashlib.sha256).digest()
+
 
-    return data.decode()
+def mask_card_number(card_number):
+    return f"**** {card_number[-4:]}"
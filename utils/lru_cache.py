@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Size-bounded LRU mapping with an optional per-entry time to live.
+
+    Not thread safe: it is meant to be shared between coroutines of one event loop.
+    """
+
+    _missing = object()
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, self._missing)
+
+        if entry is self._missing or self._is_expired(entry):
+            if entry is not self._missing:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, self._missing)
+        return default if entry is self._missing else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, self._missing)
+        return entry is not self._missing and not self._is_expired(entry)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _is_expired(self, entry) -> bool:
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
@@ -0,0 +1,88 @@
+import decimal
+from typing import Annotated, Union
+
+from pydantic import BeforeValidator, PlainSerializer, WithJsonSchema
+
+# Money is stored and computed in kopecks (integer minor units); these helpers are the only place
+# where hryvnias are converted to kopecks and back.
+MINOR_UNITS = 100
+
+# Largest amount in kopecks a BIGINT column holds
+MAX_MINOR = 2 ** 63 - 1
+
+# Commission rate in basis points (1/100 of a percent)
+COMMISSION_BPS = 300
+
+
+def to_minor(value: Union[int, str, float, decimal.Decimal]) -> int:
+    """
+    Amount in hryvnias (as sent by API clients) to kopecks.
+
+    Raises ValueError if the amount is not a finite number, has more than two decimal places (so
+    nothing is ever rounded away silently) or does not fit the BIGINT columns money is stored in.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+
+    if isinstance(value, int):
+        return check_minor_range(value * MINOR_UNITS)
+
+    try:
+        # str() keeps floats at their shortest representation (0.1 stays 0.1, not 0.1000000000000000055)
+        amount = decimal.Decimal(str(value).strip())
+    except decimal.InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+
+    minor = amount * MINOR_UNITS
+    if minor != minor.to_integral_value():
+        raise ValueError("Amount can have at most 2 decimal places")
+
+    return check_minor_range(int(minor))
+
+
+def check_minor_range(amount: int) -> int:
+    if abs(amount) > MAX_MINOR:
+        raise ValueError(f"Amount must be at most {format_minor(MAX_MINOR)} in absolute value")
+
+    return amount
+
+
+def from_minor(amount: int) -> decimal.Decimal:
+    """Kopecks to hryvnias, always with two decimal places."""
+    return decimal.Decimal(amount).scaleb(-2)
+
+
+def format_minor(amount: int) -> str:
+    sign = "-" if amount < 0 else ""
+    whole, cents = divmod(abs(amount), MINOR_UNITS)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+def commission_of(amount: int, rate_bps: int = COMMISSION_BPS) -> int:
+    """
+    Commission in kopecks for an amount in kopecks. Half a kopeck is rounded up (away from zero),
+    in integer arithmetic.
+    """
+    commission, remainder = divmod(abs(amount) * rate_bps, 10_000)
+    if remainder * 2 >= 10_000:
+        commission += 1
+
+    return commission if amount >= 0 else -commission
+
+
+# Request field: accepts hryvnias as a JSON number or string, holds kopecks
+MoneyInput = Annotated[
+    int,
+    BeforeValidator(to_minor),
+    WithJsonSchema({"anyOf": [{"type": "number"}, {"type": "string", "pattern": r"^-?\d+(\.\d{1,2})?$"}]})
+]
+
+# Response field: holds kopecks, rendered as a hryvnia string with two decimal places ("12.30")
+MoneyOutput = Annotated[
+    int,
+    PlainSerializer(format_minor, return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string", "pattern": r"^-?\d+\.\d{2}$"})
+]
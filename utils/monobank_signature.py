@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import binascii
+import os
+import time
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+load_dotenv()
+
+MONOBANK_API_URL = os.getenv("MONOBANK_API_URL", "https://api.monobank.ua")
+MONOBANK_TOKEN = os.getenv("MONOBANK_TOKEN")
+# Accept callbacks without checking X-Sign; only for local runs without a merchant token
+MONOBANK_SKIP_SIGNATURE = os.getenv("MONOBANK_SKIP_SIGNATURE", "").lower() in ("1", "true", "yes", "on")
+MONOBANK_PUBKEY_TTL = float(os.getenv("MONOBANK_PUBKEY_TTL", 3600))
+MONOBANK_PUBKEY_MIN_REFRESH = float(os.getenv("MONOBANK_PUBKEY_MIN_REFRESH", 60))
+
+
+class MonobankPublicKeyCache:
+    """
+    Merchant public key used to sign webhooks, fetched from Monobank once and kept for `ttl` seconds.
+
+    A forced refresh (after a signature mismatch, e.g. on key rotation) is honoured at most once per
+    `min_refresh` seconds, so forged callbacks cannot make us hammer the Monobank API.
+    """
+
+    def __init__(self, api_url: str, token: Optional[str], ttl: float, min_refresh: float):
+        self.api_url = api_url
+        self.token = token
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+
+        self._key: Optional[ec.EllipticCurvePublicKey] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def set_key(self, key: ec.EllipticCurvePublicKey):
+        self._key = key
+        self._fetched_at = time.monotonic()
+
+    async def get_key(self, force_refresh: bool = False) -> ec.EllipticCurvePublicKey:
+        if self._key is not None and not self._needs_refresh(force_refresh):
+            return self._key
+
+        async with self._lock:
+            # Another coroutine may have refreshed the key while we were waiting for the lock
+            if self._key is None or self._needs_refresh(force_refresh):
+                self.set_key(await self._fetch_key())
+
+        return self._key
+
+    def _needs_refresh(self, force_refresh: bool) -> bool:
+        age = time.monotonic() - self._fetched_at
+        return age > self.ttl or (force_refresh and age > self.min_refresh)
+
+    async def _fetch_key(self) -> ec.EllipticCurvePublicKey:
+        async with aiohttp.ClientSession() as client:
+            async with client.get(f"{self.api_url}/api/merchant/pubkey", headers={"X-Token": self.token}) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+
+        return load_pem_public_key(base64.b64decode(data["key"]))
+
+
+monobank_pubkey = MonobankPublicKeyCache(
+    api_url=MONOBANK_API_URL,
+    token=MONOBANK_TOKEN,
+    ttl=MONOBANK_PUBKEY_TTL,
+    min_refresh=MONOBANK_PUBKEY_MIN_REFRESH
+)
+
+
+def check_signature(key: ec.EllipticCurvePublicKey, body: bytes, signature: bytes) -> bool:
+    try:
+        key.verify(signature, body, ec.ECDSA(hashes.SHA256()))
+        return True
+    except InvalidSignature:
+        return False
+
+
+async def verify_monobank_signature(
+        body: bytes,
+        x_sign: Optional[str],
+        key_cache: MonobankPublicKeyCache = monobank_pubkey
+) -> bool:
+    """
+    Check the X-Sign header (base64 ECDSA/SHA-256 signature of the raw body) of a Monobank callback.
+
+    :param body: The raw request body exactly as received.
+    :param x_sign: The X-Sign header value.
+    :param key_cache: Source of the merchant public key.
+    :return: True if the signature matches the current (or freshly rotated) merchant key.
+    """
+    if not x_sign:
+        return False
+
+    try:
+        signature = base64.b64decode(x_sign, validate=True)
+    except binascii.Error:
+        return False
+
+    if check_signature(await key_cache.get_key(), body, signature):
+        return True
+
+    # The merchant key may have been rotated since we cached it
+    return check_signature(await key_cache.get_key(force_refresh=True), body, signature)
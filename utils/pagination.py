@@ -0,0 +1,26 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    """Opaque, URL-safe cursor pointing right after the row (moment, row_id) of a keyset-ordered list."""
+    raw = json.dumps([moment.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError if the cursor was not produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        moment, row_id = json.loads(raw)
+        moment = datetime.fromisoformat(moment)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+    if type(row_id) is not int:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+    return moment, row_id
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from database.cruds.partitions import maintain_transaction_partitions, TRANSACTION_PARTITIONS_AHEAD, \
+    TRANSACTION_PARTITIONS_RETAIN
+
+load_dotenv()
+
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", 86400))
+
+
+class PartitionMaintenanceScheduler:
+    """
+    Background task keeping the monthly partitions of transactions in shape: the next months are
+    created well before the first insert needs them, old months are detached when retention is set.
+    Runs once at startup and then every `interval` seconds.
+    """
+
+    def __init__(
+            self,
+            interval: float = PARTITION_MAINTENANCE_INTERVAL,
+            months_ahead: int = TRANSACTION_PARTITIONS_AHEAD,
+            retain_months: int = TRANSACTION_PARTITIONS_RETAIN
+    ):
+        self.interval = interval
+        self.months_ahead = months_ahead
+        self.retain_months = retain_months
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="partition-maintenance")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                created, detached = await maintain_transaction_partitions(self.months_ahead, self.retain_months)
+                if created or detached:
+                    print(f"Transaction partitions created: {created}, detached: {detached}")
+            except Exception as err:
+                print(f"Partition maintenance failed: {err}")
+
+            await asyncio.sleep(self.interval)
+
+
+partition_maintenance = PartitionMaintenanceScheduler()
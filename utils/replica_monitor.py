@@ -0,0 +1,62 @@
+import asyncio
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from database.database import check_replica, replica_engine, replica_status, REPLICA_MAX_LAG
+
+load_dotenv()
+
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 1.0))
+
+
+class ReplicaMonitor:
+    """
+    Background task measuring the replica lag every `interval` seconds. Reads are routed to the replica
+    only while the last check found it reachable and less than REPLICA_MAX_LAG seconds behind, so a
+    replica that stops replaying or goes down drops out within one interval and comes back once caught up.
+    Does nothing when no replica is configured.
+    """
+
+    def __init__(self, interval: float = REPLICA_CHECK_INTERVAL):
+        self.interval = interval
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if replica_engine is None:
+            return
+
+        self._task = asyncio.create_task(self._run(), name="replica-monitor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            was_usable = replica_status.usable
+
+            try:
+                # A hung replica must not stall the checks, the fallback relies on them
+                await asyncio.wait_for(check_replica(), timeout=max(self.interval, 1.0))
+            except Exception as err:
+                replica_status.usable, replica_status.lag = False, None
+                if was_usable:
+                    print(f"Replica check failed, reading from the primary: {err!r}")
+            else:
+                if was_usable and not replica_status.usable:
+                    print(f"Replica is {replica_status.lag} s behind (limit {REPLICA_MAX_LAG} s), "
+                          f"reading from the primary")
+                elif replica_status.usable and not was_usable:
+                    print("Replica caught up, reads go to the replica")
+
+            await asyncio.sleep(self.interval)
+
+
+replica_monitor = ReplicaMonitor()
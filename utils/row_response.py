@@ -0,0 +1,44 @@
+from typing import Annotated, Dict, List, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Row
+from typing_extensions import TypedDict
+
+# One list serializer per response schema, built on first use
+ROW_ADAPTERS: Dict[Type[BaseModel], TypeAdapter] = {}
+
+
+def schema_columns(model: type, schema: Type[BaseModel]) -> List:
+    """Columns of `model` named like the fields of `schema`: selecting them fetches exactly what the response needs."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def row_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    Serializer of a list of plain dicts shaped like `schema`: a TypedDict with the same field types and
+    serializers (MoneyOutput and the like), so the JSON matches a dump of the schema.
+    """
+    adapter = ROW_ADAPTERS.get(schema)
+    if adapter is None:
+        fields = {
+            name: Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+            for name, field in schema.model_fields.items()
+        }
+        adapter = ROW_ADAPTERS[schema] = TypeAdapter(List[TypedDict(f"{schema.__name__}Row", fields)])
+
+    return adapter
+
+
+def rows_response(rows: Sequence[Row], schema: Type[BaseModel], status_code: int = 200) -> Response:
+    """
+    JSON list of `schema` built straight from Core rows of schema_columns(model, schema).
+
+    The rows were typed by the database columns, so they are only serialized, by pydantic-core straight
+    to bytes: no ORM objects are hydrated and no schema instances are validated, neither here nor by
+    FastAPI against the response model.
+    """
+    names = list(schema.model_fields)
+    content = row_adapter(schema).dump_json([dict(zip(names, row)) for row in rows])
+
+    return Response(content=content, status_code=status_code, media_type="application/json")
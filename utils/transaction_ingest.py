@@ -0,0 +1,152 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+
+from database.cruds.partitions import ensure_transaction_months
+from database.cruds.transactions import copy_transactions
+from database.models import TransactionType, TransactionStatus
+from utils.money import MoneyInput
+
+load_dotenv()
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 5000))
+# Invalid lines listed per chunk in the report; the rest are only counted
+INGEST_MAX_REPORTED_ERRORS = 20
+
+
+class IngestTransaction(BaseModel):
+    """One NDJSON line of a bulk load. Amounts are in hryvnias like everywhere else in the API."""
+    invoice_id: str
+    amount: MoneyInput
+    commission: Optional[MoneyInput] = None
+    transaction_type: TransactionType
+    transaction_status: TransactionStatus
+    sender_id: Optional[int] = None
+    receiver_id: Optional[int] = None
+    task_id: Optional[int] = None
+    transaction_date: Optional[datetime] = None
+
+    def to_record(self, default_date: datetime) -> Tuple:
+        # Same order as INGEST_COLUMNS; enum columns store member names
+        return (
+            self.invoice_id,
+            self.sender_id,
+            self.receiver_id,
+            self.task_id,
+            self.amount,
+            self.commission,
+            self.transaction_type.name,
+            self.transaction_status.name,
+            self.utc_date(default_date)
+        )
+
+    def utc_date(self, default_date: datetime) -> datetime:
+        # transaction_date is a naive UTC timestamp
+        if self.transaction_date is None:
+            return default_date
+        if self.transaction_date.tzinfo is not None:
+            return self.transaction_date.astimezone(timezone.utc).replace(tzinfo=None)
+        return self.transaction_date
+
+
+async def ndjson_lines(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Numbered non-empty lines of an NDJSON byte stream, however the stream is split into chunks."""
+    number, tail = 0, b""
+
+    async for chunk in byte_chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+
+    if tail.strip():
+        yield number + 1, tail
+
+
+async def write_chunk(lines: List[Tuple[int, bytes]]) -> dict:
+    """Validate and write one chunk. Invalid lines are left out; a database error fails the whole chunk."""
+    default_date = datetime.utcnow()
+    records, invalid, invalid_count = [], [], 0
+
+    for number, line in lines:
+        try:
+            records.append(IngestTransaction.model_validate_json(line).to_record(default_date))
+        except ValidationError as err:
+            invalid_count += 1
+            if len(invalid) < INGEST_MAX_REPORTED_ERRORS:
+                invalid.append({"line": number, "error": str(err.errors(include_url=False)[0]["msg"])})
+
+    report = {
+        "first_line": lines[0][0],
+        "last_line": lines[-1][0],
+        "rows": len(lines),
+        "inserted": 0,
+        "skipped": 0,
+        "invalid": invalid_count,
+        "invalid_lines": invalid,
+        "error": None
+    }
+
+    if records:
+        try:
+            await ensure_transaction_months({record[-1].date().replace(day=1) for record in records})
+            report["inserted"] = await copy_transactions(records)
+            report["skipped"] = len(records) - report["inserted"]
+        except Exception as err:
+            report["error"] = str(err).splitlines()[0]
+
+    return report
+
+
+async def ingest_transactions(
+        byte_chunks: AsyncIterator[bytes],
+        chunk_size: int = INGEST_CHUNK_SIZE
+) -> AsyncIterator[dict]:
+    """
+    Load NDJSON transactions in chunks of `chunk_size` lines, each validated and written in its own
+    transaction, and yield one report per chunk followed by a summary.
+
+    A failing chunk is reported and the load goes on with the next one. Invoices already stored are
+    skipped, so re-running a load only adds what is missing.
+    """
+    started = time.perf_counter()
+    totals = {"rows": 0, "inserted": 0, "skipped": 0, "invalid": 0, "failed_chunks": 0}
+    chunk_number, lines = 0, []
+
+    async def flush() -> dict:
+        nonlocal chunk_number
+        chunk_number += 1
+
+        report = {"chunk": chunk_number, **await write_chunk(lines)}
+        for key in ("rows", "inserted", "skipped", "invalid"):
+            totals[key] += report[key]
+        if report["error"] is not None:
+            totals["failed_chunks"] += 1
+
+        lines.clear()
+        return report
+
+    async for line in ndjson_lines(byte_chunks):
+        lines.append(line)
+        if len(lines) >= chunk_size:
+            yield await flush()
+
+    if lines:
+        yield await flush()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "summary": {
+            **totals,
+            "chunks": chunk_number,
+            "elapsed": round(elapsed, 3),
+            "rows_per_second": round(totals["inserted"] / elapsed) if elapsed else 0
+        }
+    }
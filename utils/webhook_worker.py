@@ -0,0 +1,137 @@
+import asyncio
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from database.database import async_session
+from database.models import WebhookInbox
+from database.cruds.webhooks import claim_pending_webhooks, mark_webhook_processed, mark_webhook_failed
+from database.cruds.transactions import apply_monobank_credits, fail_monobank_invoices
+from utils.batch_coalescer import BatchCoalescer
+
+load_dotenv()
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 50))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", 1.0))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 5))
+WEBHOOK_RETRY_DELAY = float(os.getenv("WEBHOOK_RETRY_DELAY", 5.0))
+WEBHOOK_COALESCE_WINDOW_MS = float(os.getenv("WEBHOOK_COALESCE_WINDOW_MS", 5))
+
+
+class WebhookWorkerPool:
+    """
+    In-process pool of workers draining the webhook inbox.
+
+    Each worker claims a batch of pending rows with FOR UPDATE SKIP LOCKED, so several workers (and
+    several app nodes) can share one inbox, and holds the lock while the rows are applied. Applying
+    commits in its own transactions, before the claiming one marks the rows processed: a crash in
+    between leaves them pending and they are applied again, so application is at-least-once and relies
+    on the credits being idempotent per invoice. Failed rows are retried with a linear backoff until
+    max_attempts.
+
+    Successful payments of the same user arriving within the coalesce window (from any worker of the
+    pool) are credited together in one statement; failed payments are flagged in bulk the same way.
+    """
+
+    def __init__(
+            self,
+            workers: int = WEBHOOK_WORKERS,
+            batch_size: int = WEBHOOK_BATCH_SIZE,
+            poll_interval: float = WEBHOOK_POLL_INTERVAL,
+            max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+            retry_delay: float = WEBHOOK_RETRY_DELAY,
+            coalesce_window_ms: float = WEBHOOK_COALESCE_WINDOW_MS
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._credits = BatchCoalescer(apply_monobank_credits, coalesce_window_ms / 1000)
+        self._failures = BatchCoalescer(lambda _, invoice_ids: fail_monobank_invoices(invoice_ids),
+                                        coalesce_window_ms / 1000)
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_worker(worker_id), name=f"webhook-worker-{worker_id}")
+            for worker_id in range(self.workers)
+        ]
+
+    async def stop(self):
+        self._stopping = True
+        self.notify()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        # Wakes idle workers right away instead of waiting for the next poll
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_worker(self, worker_id: int):
+        while not self._stopping:
+            try:
+                processed = await self.process_batch()
+            except Exception as err:
+                print(f"Webhook worker {worker_id} failed: {err}")
+                processed = 0
+
+            if not processed:
+                await self._wait_for_work()
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+        self._wakeup.clear()
+
+    async def process_batch(self) -> int:
+        async with async_session() as session:
+            async with session.begin():
+                inbox_rows = await claim_pending_webhooks(session, self.batch_size)
+
+                results = await asyncio.gather(
+                    *(self._apply(inbox_row) for inbox_row in inbox_rows),
+                    return_exceptions=True
+                )
+
+                # A cancelled apply (e.g. on shutdown) may not have credited anything: leave the whole
+                # batch pending by rolling the claim back instead of marking its rows
+                for result in results:
+                    if isinstance(result, BaseException) and not isinstance(result, Exception):
+                        raise result
+
+                for inbox_row, result in zip(inbox_rows, results):
+                    if isinstance(result, Exception):
+                        print(f"Failed to apply webhook {inbox_row.inbox_id}: {result}")
+                        mark_webhook_failed(inbox_row, str(result), self.max_attempts, self.retry_delay)
+                    else:
+                        mark_webhook_processed(inbox_row)
+
+        return len(inbox_rows)
+
+    async def _apply(self, inbox_row: WebhookInbox):
+        payload = inbox_row.payload
+        transaction_status = payload.get("status")
+
+        if transaction_status == "success":
+            # Monobank reports amounts in kopecks, the unit balances are kept in
+            await self._credits.submit(inbox_row.user_id, (payload.get("invoiceId"), int(payload.get("amount"))))
+
+        elif transaction_status == "failure":
+            await self._failures.submit(None, payload.get("invoiceId"))
+
+
+webhook_workers = WebhookWorkerPool()